@@ -8,7 +8,11 @@ from flask_cors import CORS as Cors
 
 import config
 
+from api.instrumentation import instrumentation
+from api.models.engine import attach_pool_metrics, engine_options
 from api.models.model import db
+from api.models.routing import replica_binds
+from api.routes import create_blueprint
 
 
 QUESTIONS_PER_PAGE = 10
@@ -21,20 +25,26 @@ def create_application(config='Development'):
     """Initializes the core application."""
     app = Flask(__name__)
     app.config.from_object(f'config.{config}Config')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(app.config)
 
     # Initialize plugins
     db.app = app
     db.init_app(app)
-    db.create_all()
+    attach_pool_metrics(app, [db.engine, *db.replica_engines(app)])
+    db.init_read_routing(app)
+    instrumentation.init_app(app, [db.engine, *db.replica_engines(app)])
+    if app.config['DB_CREATE_ALL']:
+        db.create_all()
     Cors(app)
     #Cors(app, resources={r'*/api/*': {origins: '*}})
+    app.register_blueprint(create_blueprint())
 
     with app.app_context():
-        # Import routes
-        import api.resources.categories
-        import api.resources.questions
-        import api.resources.quizzes
-        import api.errors.handlers
+        # Build the in-memory search index before serving any requests
+        if app.config.get('SEARCH_BACKEND') == 'memory':
+            from api.search.inverted_index import question_search_index
+            question_search_index.refresh()
 
         return app
 
@@ -50,6 +60,58 @@ def create_application(config='Development'):
         )
         return response
 
+
+def warm_caches(app):
+    """Loads the category, question count and quiz caches, and the search
+    index if searches are served from memory, then closes every database
+    connection.
+
+    A preloading server calls this once before forking its workers, so each
+    worker starts with the caches loaded instead of loading its own on its
+    first requests, and without any connection shared with the others.
+    """
+    from api.cache.categories import category_cache
+    from api.cache.question_counts import question_counts
+    from api.cache.question_index import question_index
+    from api.search.inverted_index import question_search_index
+
+    with app.app_context():
+        caches = [category_cache, question_counts, question_index]
+        if (app.config.get('SEARCH_BACKEND') == 'memory' and
+                not question_search_index.is_loaded):
+            caches.append(question_search_index)
+        for cache in caches:
+            cache.refresh()
+        db.dispose_engines(app)
+
+
+def per_process_warnings(app, workers):
+    """Lists the settings of an application which keep state in the memory
+    of each worker process, and so misbehave with several workers.
+
+    Args:
+        app: The application to check.
+        workers: The number of worker processes serving it.
+    """
+    if workers <= 1:
+        return []
+    warnings = []
+    if app.config['QUIZ_SESSION_STORE'] == 'memory':
+        warnings.append(
+            f'QUIZ_SESSION_STORE=memory keeps server-side quizzes in each of '
+            f'the {workers} workers, so a quiz_id started on one worker is '
+            f'unknown to the others, which answer it with 404. Set '
+            f'WEB_CONCURRENCY=1 if clients start server-side quizzes.'
+        )
+    if app.config['RESPONSE_CACHE_BACKEND'] in ('memory', 'local'):
+        warnings.append(
+            f'RESPONSE_CACHE_BACKEND={app.config["RESPONSE_CACHE_BACKEND"]} '
+            f'caches responses in each of the {workers} workers, so a write '
+            f'made through one worker is only seen by the others once their '
+            f'cached responses expire, after RESPONSE_CACHE_TTL seconds.'
+        )
+    return warnings
+
 '''
   @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
 '''
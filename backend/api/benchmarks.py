@@ -0,0 +1,404 @@
+"""Seeds synthetic question banks and measures the latency of the API."""
+
+import http.client
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from flask import Flask
+from sqlalchemy import func, text
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from api.cache.categories import category_cache
+from api.cache.question_counts import question_counts
+from api.cache.question_index import question_index
+from api.cache.responses import response_cache
+from api.instrumentation import instrumentation
+from api.models.category import Category
+from api.models.model import db
+from api.models.question import Question
+from api.search.inverted_index import question_search_index
+
+
+# The categories of trivia.psql, created if the database has none
+CATEGORIES = ('Science', 'Art', 'Geography', 'History', 'Entertainment',
+              'Sports')
+
+# Words synthetic questions are made of, and searched for
+WORDS = (
+    'ancient', 'atom', 'battle', 'canvas', 'capital', 'century', 'comet',
+    'composer', 'continent', 'desert', 'dynasty', 'element', 'empire',
+    'festival', 'film', 'football', 'galaxy', 'glacier', 'island', 'king',
+    'marathon', 'molecule', 'mountain', 'novel', 'ocean', 'olympic',
+    'painter', 'planet', 'queen', 'river', 'sculpture', 'series', 'stadium',
+    'symphony', 'theatre', 'treaty', 'volcano', 'war',
+)
+
+SCENARIOS = ('questions', 'search', 'category_questions', 'quizzes')
+
+# Request: (method, path, JSON body)
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+# The directory of config.py, from which the application is imported
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Times one cold start in a fresh interpreter: the import of the
+# application, its creation, and its first request
+_STARTUP_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from api.app import create_application
+imported = time.perf_counter()
+app = create_application(sys.argv[1])
+created = time.perf_counter()
+response = app.test_client().get(sys.argv[2])
+response.get_data()
+served = time.perf_counter()
+print(json.dumps({
+    'status': response.status_code,
+    'import': imported - started,
+    'create': created - imported,
+    'first_request': served - created,
+}))
+'''
+
+
+def seed_questions(
+    rows: int,
+    batch_size: int = 10000,
+    seed: int = 0
+) -> float:
+    """Replaces every question with synthetic ones.
+
+    Each question is a few random words of WORDS, in a random category with
+    a random difficulty, so searches and category filters match a realistic
+    share of the bank. The categories of trivia.psql are created first if
+    there are none.
+
+    Args:
+        rows: The number of questions to insert.
+        batch_size: The number of questions to insert per transaction.
+        seed: The seed of the random generator, for reproducible banks.
+
+    Returns:
+        The time taken to seed the questions, in seconds.
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+
+    categories = Category.fetch_all()
+    if not categories:
+        Category.insert_many([{'type': name} for name in CATEGORIES])
+        categories = Category.fetch_all()
+    category_ids = sorted(categories)
+
+    db.session.execute(Question.__table__.delete())
+    db.session.commit()
+    for cache in (question_index, question_counts, question_search_index,
+                  category_cache):
+        cache.invalidate()
+    response_cache.bump(Question)
+
+    for start in range(0, rows, batch_size):
+        Question.insert_many([
+            {
+                'question': ' '.join(rng.choices(WORDS, k=8)).capitalize()
+                + '?',
+                'answer': rng.choice(WORDS).capitalize(),
+                'category': rng.choice(category_ids),
+                'difficulty': rng.randint(1, 5),
+            }
+            for _ in range(min(batch_size, rows - start))
+        ])
+
+    with db.engine.connect() as connection:
+        connection.execution_options(isolation_level='AUTOCOMMIT')\
+                  .execute(text('ANALYZE questions'))
+    return time.perf_counter() - started
+
+
+class Workload():
+    """Builds random requests for each benchmarked endpoint, against the
+    questions currently in the database.
+
+    Pages, categories, search terms and previously asked questions are drawn
+    uniformly, so every part of the bank is read, not only its first page.
+    The questions of a category are fetched a page at a time with keyset
+    pagination, after a random id of the category, rather than streamed as
+    a whole.
+    """
+
+    def __init__(self, page_length: int, seed: int = 0) -> None:
+        self.rng = random.Random(seed)
+        self.page_length = page_length
+        self.categories = sorted((Category.fetch_all() or {}).items())
+        self.counts = Question.count_by_category()
+        first, last = db.session.query(func.min(Question.id),
+                                       func.max(Question.id)).one()
+        self.first_id = first or 0
+        self.last_id = last or 0
+        # The (category id, first id, last id) of each category's questions
+        self.category_ids = sorted(
+            tuple(row) for row in db.session.query(
+                Question.category,
+                func.min(Question.id),
+                func.max(Question.id)
+            ).group_by(Question.category)
+            if row[0] is not None
+        )
+
+    def _page(self, count: int) -> int:
+        """Picks a random page of a listing of count questions."""
+        return self.rng.randint(1, max(1, -(-count // self.page_length)))
+
+    def questions(self) -> Request:
+        """A page of every question."""
+        page = self._page(sum(self.counts.values()))
+        return 'GET', f'/questions?page={page}', None
+
+    def search(self) -> Request:
+        """A search for a random word."""
+        return 'POST', '/questions/search', {
+            'search_term': self.rng.choice(WORDS),
+        }
+
+    def category_questions(self) -> Request:
+        """A page of the questions of a random category, following a random
+        id before its last question, so the page is never empty."""
+        category_id, first, last = self.rng.choice(self.category_ids)
+        after = self.rng.randint(first - 1, last - 1)
+        return ('GET',
+                f'/categories/{category_id}/questions'
+                f'?after={after}&limit={self.page_length}',
+                None)
+
+    def quizzes(self) -> Request:
+        """The next question of a quiz of a random category, with a few
+        questions already asked."""
+        category_id, category_type = self.rng.choice(self.categories)
+        asked = [self.rng.randint(self.first_id, self.last_id)
+                 for _ in range(self.rng.randint(0, 10))]
+        return 'POST', '/quizzes', {
+            'quiz_category': {'id': category_id, 'type': category_type},
+            'previous_questions': asked,
+        }
+
+    def requests(self, scenario: str, count: int) -> List[Request]:
+        """Builds count requests of a scenario, ahead of timing them."""
+        build: Callable[[], Request] = getattr(self, scenario)
+        return [build() for _ in range(count)]
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Fetches the nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * fraction // 1))
+    return values[int(rank) - 1]
+
+
+def summarize(
+    latencies: List[float],
+    queries: List[int],
+    errors: int,
+    elapsed: float
+) -> Dict[str, Any]:
+    """Reduces the measurements of a run to its latency percentiles,
+    throughput and query counts.
+
+    Args:
+        latencies: The latency of each successful request, in seconds.
+        queries: The number of SQL statements run by each request.
+        errors: The number of requests which failed.
+        elapsed: The wall-clock duration of the run, in seconds.
+    """
+    latencies = sorted(latencies)
+    milliseconds = [latency * 1000 for latency in latencies]
+    requests = len(latencies) + errors
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': percentile(milliseconds, 0.50),
+        'p95_ms': percentile(milliseconds, 0.95),
+        'p99_ms': percentile(milliseconds, 0.99),
+        'mean_ms': sum(milliseconds) / len(milliseconds)
+        if milliseconds else None,
+        'throughput_rps': requests / elapsed if elapsed else None,
+        'queries_per_request': sum(queries) / len(queries)
+        if queries else None,
+        'queries_max': max(queries, default=None),
+    }
+
+
+def _count_queries(server_timing: Optional[str]) -> Optional[int]:
+    """Reads the number of SQL statements from a Server-Timing header."""
+    match = _SERVER_TIMING_QUERIES.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+def run_client(app: Flask, requests: List[Request]) -> Dict[str, Any]:
+    """Sends requests one at a time through the Flask test client, without
+    any network or server overhead.
+
+    The statements run by each request are counted by the instrumentation
+    of the application, once its response has been sent and closed, so the
+    queries of streamed responses are counted as well.
+
+    Args:
+        app: The application to benchmark.
+        requests: The requests to send.
+    """
+    client = app.test_client()
+    latencies: List[float] = []
+    queries: List[int] = []
+    errors = 0
+    started = time.perf_counter()
+    for method, path, body in requests:
+        sent = time.perf_counter()
+        counted = instrumentation.query_count()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        response.close()
+        latency = time.perf_counter() - sent
+        if response.status_code >= 400:
+            errors += 1
+            continue
+        latencies.append(latency)
+        queries.append(instrumentation.query_count() - counted)
+    return summarize(latencies, queries, errors,
+                     time.perf_counter() - started)
+
+
+def run_http(
+    base_url: str,
+    requests: List[Request],
+    concurrency: int = 8
+) -> Dict[str, Any]:
+    """Sends requests over HTTP from concurrent clients, each keeping its
+    connection alive between requests.
+
+    The statements run by each request are read from its Server-Timing
+    header, which streamed responses do not carry, so their queries are
+    left out of the counts.
+
+    Args:
+        base_url: The URL of the server, such as 'http://127.0.0.1:5000'.
+        requests: The requests to send, shared among the clients.
+        concurrency: The number of clients sending requests at once.
+    """
+    url = urlsplit(base_url)
+    local = threading.local()
+
+    def send(request: Request) -> Tuple[Optional[float], Optional[int]]:
+        method, path, body = request
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection(
+                url.hostname, url.port, timeout=60
+            )
+        payload = None if body is None else json.dumps(body)
+        headers = {'Content-Type': 'application/json'} if payload else {}
+        sent = time.perf_counter()
+        try:
+            connection.request(method, url.path.rstrip('/') + path,
+                               payload, headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            local.connection = None
+            return None, None
+        latency = time.perf_counter() - sent
+        if response.status >= 400:
+            return None, None
+        return latency, _count_queries(response.getheader('Server-Timing'))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, requests))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results if latency is not None]
+    queries = [count for _, count in results if count is not None]
+    return summarize(latencies, queries, len(results) - len(latencies),
+                     elapsed)
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    """Serves requests without logging each of them."""
+
+    def log_request(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+
+def serve(app: Flask, host: str = '127.0.0.1') -> Tuple[Any, str]:
+    """Serves an application from a background thread, on a free port.
+
+    Returns:
+        The server, to shut down once the benchmark is over, and its URL.
+    """
+    server = make_server(host, 0, app, threaded=True,
+                         request_handler=_QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_port}'
+
+
+def measure_startup(
+    config: str,
+    runs: int = 10,
+    path: str = '/categories',
+    env: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """Times cold starts of the application, each in a fresh interpreter,
+    as when a worker is spawned.
+
+    Args:
+        config: The configuration class prefix, such as 'Production'.
+        runs: The number of cold starts to time.
+        path: The path of the first request, sent through the test client.
+        env: Environment variables to set, in addition to the current ones.
+
+    Returns:
+        The p50, p95 and maximum duration of each phase, in milliseconds:
+        'process' from spawning the interpreter until it exits, 'import' of
+        the application, 'create' of the application by
+        create_application(), and 'first_request'.
+    """
+    timings: Dict[str, List[float]] = {
+        'process': [], 'import': [], 'create': [], 'first_request': [],
+    }
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', _STARTUP_SCRIPT, config, path],
+            cwd=_BACKEND,
+            env={**os.environ, **(env or {})},
+            stdout=subprocess.PIPE,
+            check=True
+        ).stdout
+        timings['process'].append(time.perf_counter() - started)
+        phases = json.loads(output.splitlines()[-1])
+        if phases['status'] >= 400:
+            raise RuntimeError(f'GET {path} failed with {phases["status"]}')
+        for phase in ('import', 'create', 'first_request'):
+            timings[phase].append(phases[phase])
+
+    summary: Dict[str, Any] = {'runs': runs}
+    for phase, values in timings.items():
+        milliseconds = sorted(value * 1000 for value in values)
+        summary[phase] = {
+            'p50_ms': percentile(milliseconds, 0.50),
+            'p95_ms': percentile(milliseconds, 0.95),
+            'max_ms': max(milliseconds, default=None),
+        }
+    return summary
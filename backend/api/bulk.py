@@ -0,0 +1,111 @@
+"""Bulk import of trivia questions."""
+
+import json
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from api.cache.categories import category_cache
+from api.models.model import db
+from api.models.question import Question
+
+
+class RowError(NamedTuple):
+    """A record which could not be imported."""
+    row: int
+    message: str
+
+
+class ImportResult(NamedTuple):
+    """The outcome of a bulk import."""
+    inserted: int
+    errors: List[RowError]
+
+
+def parse_ndjson(lines: Iterable[bytes]) -> Iterator[Any]:
+    """Decodes newline-delimited JSON, one record per non-blank line.
+
+    Lines which are not valid JSON are yielded as ValueError instances, so
+    they can be reported with the rest of the import errors.
+
+    Args:
+        lines: The lines of the NDJSON document, such as a file or stream.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            yield ValueError(f'Invalid JSON: {error}.')
+
+
+def validate_question(record: Any) -> Dict[str, Any]:
+    """Validates one record, resolving its category through the cache.
+
+    Raises:
+        ValueError: The record is not a valid question.
+    """
+    if isinstance(record, ValueError):
+        raise record
+    question = Question.validate_all(record)
+    category = category_cache.resolve(question['category'])
+    if not category:
+        raise ValueError(f'Unknown category: {question["category"]}.')
+    return {**question, 'category': category['id']}
+
+
+def _insert_batch(
+    batch: List[Tuple[int, Dict[str, Any]]],
+    errors: List[RowError]
+) -> int:
+    """Inserts a batch of questions, falling back to one row at a time to
+    find the rows the database rejects.
+
+    Returns:
+        The number of questions inserted.
+    """
+    try:
+        Question.insert_many([question for _, question in batch])
+        return len(batch)
+    except SQLAlchemyError as error:
+        db.session.rollback()
+        if len(batch) == 1:
+            message = str(getattr(error, 'orig', None) or error)
+            errors.append(RowError(batch[0][0], message))
+            return 0
+    return sum(_insert_batch([row], errors) for row in batch)
+
+
+def import_questions(
+    records: Iterable[Any],
+    batch_size: int = 1000
+) -> ImportResult:
+    """Validates and inserts questions in batches of one transaction each.
+
+    Records which fail validation are skipped and reported; the rest are
+    still imported.
+
+    Args:
+        records: The attributes of each question, as decoded JSON.
+        batch_size: The number of questions to insert per transaction.
+
+    Returns:
+        The number of questions inserted, and an error for each of those
+        which were not, numbered from 1 in the order of the records.
+    """
+    inserted = 0
+    errors: List[RowError] = []
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    for row, record in enumerate(records, start=1):
+        try:
+            batch.append((row, validate_question(record)))
+        except ValueError as error:
+            errors.append(RowError(row, str(error)))
+            continue
+        if len(batch) == batch_size:
+            inserted += _insert_batch(batch, errors)
+            batch = []
+    if batch:
+        inserted += _insert_batch(batch, errors)
+    return ImportResult(inserted, errors)
@@ -0,0 +1,65 @@
+"""Defines the base Cache from which all process-level caches inherit."""
+
+import threading
+import time
+from typing import Optional
+
+from flask import current_app
+
+from api.models.model import db
+
+
+class Cache():
+    """This is the base class for in-process caches of database state.
+
+    A cache is loaded on first use and reloaded once it is older than the
+    number of seconds named by its ttl_config setting, which reconciles it
+    with writes made by other processes. Writes made by this process are
+    applied incrementally by the subclasses, or invalidate the cache.
+    """
+
+    ttl_config: Optional[str] = None
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._loaded_at: Optional[float] = None
+        self._invalidated_at: Optional[float] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the cache currently holds data."""
+        return self._loaded_at is not None
+
+    def load(self) -> None:
+        """Loads the cached data from the database."""
+        raise NotImplementedError
+
+    def refresh(self) -> None:
+        """Reloads the cached data from the database.
+
+        The cache is read from a replica if there is one, unless it was
+        invalidated within the last DB_REPLICA_LAG seconds, most likely by a
+        write of this process which the replicas may not have received yet.
+        It is then read from the primary, so the write is not missing from
+        the cache until it expires.
+        """
+        invalidated_at = self._invalidated_at
+        recent = (invalidated_at is not None and
+                  time.monotonic() - invalidated_at <
+                  current_app.config.get('DB_REPLICA_LAG', 0))
+        with self._lock, (db.primary() if recent else db.reading()):
+            self.load()
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Forces the cache to be reloaded on next use."""
+        with self._lock:
+            self._loaded_at = None
+            self._invalidated_at = time.monotonic()
+
+    def _refresh_if_stale(self) -> None:
+        """Reloads the cache if it is empty or has expired."""
+        ttl = self.ttl_config and current_app.config.get(self.ttl_config)
+        if (self._loaded_at is None or
+                (ttl and time.monotonic() - self._loaded_at > ttl)):
+            self.refresh()
@@ -0,0 +1,111 @@
+"""In-process cache of trivia question Categories."""
+
+import hashlib
+from typing import Any, Dict, Optional
+
+from api.cache.cache import Cache
+from api.encoder import Fragment, dumps
+from api.models.category import Category
+
+
+class CategoryCache(Cache):
+    """Keeps every category in memory, along with their pre-encoded JSON
+    and a strong ETag identifying the current set of categories.
+
+    Categories are mapped both from id to type and from type to id, so
+    either can be resolved without querying the database. Types are matched
+    case-insensitively.
+    """
+
+    ttl_config = 'CATEGORY_CACHE_TTL'
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._categories: Dict[int, str] = {}
+        self._ids: Dict[str, int] = {}
+        self._fragment = Fragment(b'null')
+        self._etag = ''
+
+    def load(self) -> None:
+        """Loads all categories from the database, ordered by id."""
+        self._categories = Category.fetch_all(order_by=Category.id) or {}
+        self._ids = {self._fold(category_type): category_id
+                     for category_id, category_type
+                     in self._categories.items()
+                     if category_type is not None}
+        self._fragment = Fragment(dumps(self._categories or None))
+        self._etag = hashlib.sha1(self._fragment.data).hexdigest()
+
+    @staticmethod
+    def _fold(category_type: str) -> str:
+        """Normalizes a category type for case-insensitive matching."""
+        return category_type.strip().casefold()
+
+    def all(self) -> Optional[Dict[int, str]]:
+        """Returns a dict of all categories or None.
+
+        The returned dict is shared and must not be modified.
+        """
+        with self._lock:
+            self._refresh_if_stale()
+            return self._categories or None
+
+    def by_id(self, category_id: Any) -> Optional[Dict[str, Any]]:
+        """Returns one category, as a dictionary, or None.
+
+        Args:
+            category_id: The id of the requested category, as an int or a
+                numeric string.
+        """
+        try:
+            category_id = int(category_id)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            self._refresh_if_stale()
+            category_type = self._categories.get(category_id)
+        if category_type is not None:
+            return {'id': category_id, 'type': category_type}
+
+    def by_type(self, category_type: Any) -> Optional[Dict[str, Any]]:
+        """Returns one category, as a dictionary, or None.
+
+        Args:
+            category_type: The type of the requested category, in any case.
+        """
+        if not isinstance(category_type, str):
+            return None
+        with self._lock:
+            self._refresh_if_stale()
+            category_id = self._ids.get(self._fold(category_type))
+        return self.by_id(category_id)
+
+    def resolve(self, category: Any) -> Optional[Dict[str, Any]]:
+        """Returns one category, identified by either its id or its type, as
+        a dictionary, or None.
+
+        Args:
+            category: The id of the requested category, as an int or a
+                numeric string, or its type, in any case.
+        """
+        return self.by_id(category) or self.by_type(category)
+
+    @property
+    def fragment(self) -> Fragment:
+        """The dict of all categories, or None, encoded as JSON."""
+        with self._lock:
+            self._refresh_if_stale()
+            return self._fragment
+
+    @property
+    def etag(self) -> str:
+        """A strong ETag which changes whenever the categories change."""
+        with self._lock:
+            self._refresh_if_stale()
+            return self._etag
+
+
+category_cache = CategoryCache()
+
+for event in ('insert', 'insert_many', 'update', 'delete', 'delete_many'):
+    Category.listen(event, lambda category: category_cache.invalidate())
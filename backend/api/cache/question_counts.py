@@ -0,0 +1,95 @@
+"""In-process counters of stored trivia questions."""
+
+from typing import Any, Dict, List, Optional
+
+from api.cache.cache import Cache
+from api.models.question import Question
+
+
+class QuestionCounter(Cache):
+    """Maintains the total number of questions, and the number of questions
+    in each category, without running a COUNT query per request.
+    """
+
+    ttl_config = 'QUESTION_COUNT_TTL'
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._counts: Dict[Optional[str], int] = {}
+        self._total = 0
+
+    @staticmethod
+    def _key(category: Optional[object]) -> Optional[str]:
+        """Normalizes a category id, whether an int or a numeric string."""
+        return None if category is None else str(category)
+
+    def load(self) -> None:
+        """Counts the questions in each category in a single query."""
+        self._counts = {
+            self._key(category): count
+            for category, count in Question.count_by_category().items()
+        }
+        self._total = sum(self._counts.values())
+
+    def _adjust(self, category: Optional[object], delta: int) -> None:
+        """Applies a change in the number of questions of a category."""
+        with self._lock:
+            if not self.is_loaded:
+                return
+            key = self._key(category)
+            self._counts[key] = self._counts.get(key, 0) + delta
+            self._total += delta
+
+    def add(self, question: Question) -> None:
+        """Counts a newly inserted question."""
+        self._adjust(question.category, 1)
+
+    def add_many(self, questions: List[Dict[str, Any]]) -> None:
+        """Counts a batch of inserted questions."""
+        for question in questions:
+            self._adjust(question.get('category'), 1)
+
+    def move(self, question: Question) -> None:
+        """Recounts an updated question whose category may have changed."""
+        previous = getattr(question, 'previous', {})
+        if 'category' not in previous or \
+                self._key(previous['category']) == \
+                self._key(question.category):
+            return
+        with self._lock:
+            self._adjust(previous['category'], -1)
+            self._adjust(question.category, 1)
+
+    def remove(self, question: Question) -> None:
+        """Uncounts a deleted question."""
+        self._adjust(question.category, -1)
+
+    def remove_many(self, questions: List[Dict[str, Any]]) -> None:
+        """Uncounts a batch of deleted questions."""
+        for question in questions:
+            self._adjust(question.get('category'), -1)
+
+    def total(self) -> int:
+        """Returns the number of stored questions."""
+        with self._lock:
+            self._refresh_if_stale()
+            return self._total
+
+    def category(self, category_id: object) -> int:
+        """Returns the number of stored questions in a category.
+
+        Args:
+            category_id: The id of the category to count.
+        """
+        with self._lock:
+            self._refresh_if_stale()
+            return self._counts.get(self._key(category_id), 0)
+
+
+question_counts = QuestionCounter()
+
+Question.listen('insert', question_counts.add)
+Question.listen('insert_many', question_counts.add_many)
+Question.listen('update', question_counts.move)
+Question.listen('delete', question_counts.remove)
+Question.listen('delete_many', question_counts.remove_many)
@@ -0,0 +1,254 @@
+"""In-process index of trivia question ids, grouped by category and
+difficulty."""
+
+import random
+from bisect import insort
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from api.cache.cache import Cache
+from api.models.model import db
+from api.models.question import Question
+from api.quiz.selection import choose_level
+
+
+# A bucket key: a category key, or a (category key, difficulty) pair
+BucketKey = Any
+
+
+def _unskipped_position(skipped: List[int], rank: int) -> int:
+    """Finds the position of the rank-th position of a bucket which is not
+    skipped, by binary search over the sorted skipped positions.
+
+    Exactly skipped[i] - i positions before skipped[i] are free, a count
+    which never decreases with i, so the answer lies just past the last
+    skipped position with at most rank free positions before it.
+    """
+    low, high = 0, len(skipped)
+    while low < high:
+        middle = (low + high) // 2
+        if skipped[middle] - middle > rank:
+            high = middle
+        else:
+            low = middle + 1
+    return rank + low
+
+
+class QuestionIndex(Cache):
+    """Keeps the id of every question in memory, bucketed by category and by
+    category and difficulty.
+
+    Each bucket is a list of ids plus a map from id to list position, so ids
+    can be added, removed and drawn at random without scanning the bucket.
+    The bucket keyed by None holds every question, and the bucket keyed by
+    (None, difficulty) every question of a difficulty.
+    """
+
+    ttl_config = 'QUIZ_INDEX_TTL'
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._buckets: Dict[BucketKey, List[int]] = {}
+        self._positions: Dict[BucketKey, Dict[int, int]] = {}
+        self._levels: Dict[Optional[str], Dict[int, None]] = {}
+        self._questions: Dict[int, Tuple[Optional[str], Optional[int]]] = {}
+
+    @staticmethod
+    def _key(category: Optional[object]) -> Optional[str]:
+        """Normalizes a category id, whether an int or a numeric string."""
+        return None if category is None else str(category)
+
+    def _keys(
+        self,
+        key: Optional[str],
+        difficulty: Optional[int]
+    ) -> List[BucketKey]:
+        """Lists the buckets holding a question of a category and
+        difficulty."""
+        keys: List[BucketKey] = [None, key]
+        if difficulty is not None:
+            keys += [(None, difficulty), (key, difficulty)]
+            for category in (None, key):
+                self._levels.setdefault(category, {})[difficulty] = None
+        return keys if key is not None else keys[::2]
+
+    def _append(self, key: BucketKey, question_id: int) -> None:
+        """Appends a question id to a bucket."""
+        bucket = self._buckets.setdefault(key, [])
+        self._positions.setdefault(key, {})[question_id] = len(bucket)
+        bucket.append(question_id)
+
+    def _pop(self, key: BucketKey, question_id: int) -> None:
+        """Removes a question id from a bucket by swapping in the last id."""
+        bucket = self._buckets.get(key, [])
+        positions = self._positions.get(key, {})
+        position = positions.pop(question_id, None)
+        if position is None:
+            return
+        last = bucket.pop()
+        if last != question_id:
+            bucket[position] = last
+            positions[last] = position
+
+    def _insert(self, question_id: int, category: Optional[object],
+                difficulty: Optional[int]) -> None:
+        """Adds a question to every bucket it belongs to."""
+        key = self._key(category)
+        self._questions[question_id] = (key, difficulty)
+        for bucket_key in self._keys(key, difficulty):
+            self._append(bucket_key, question_id)
+
+    def load(self) -> None:
+        """Loads the id, category and difficulty of every question from the
+        database."""
+        rows = db.session.query(Question.id, Question.category,
+                                Question.difficulty).all()
+        self._buckets = {}
+        self._positions = {}
+        self._levels = {}
+        self._questions = {}
+        for question_id, category, difficulty in rows:
+            self._insert(question_id, category, difficulty)
+
+    def add(self, question: Question) -> None:
+        """Adds a newly inserted question to the index."""
+        with self._lock:
+            if not self.is_loaded or question.id in self._questions:
+                return
+            self._insert(question.id, question.category, question.difficulty)
+
+    def discard(self, question_id: int) -> None:
+        """Removes a question from the index, if present."""
+        with self._lock:
+            if question_id not in self._questions:
+                return
+            key, difficulty = self._questions.pop(question_id)
+            for bucket_key in self._keys(key, difficulty):
+                self._pop(bucket_key, question_id)
+
+    def remove(self, question: Question) -> None:
+        """Removes a deleted question from the index."""
+        self.discard(question.id)
+
+    def remove_many(self, questions: List[Dict[str, Any]]) -> None:
+        """Removes a batch of deleted questions from the index."""
+        with self._lock:
+            for question in questions:
+                self.discard(question['id'])
+
+    def random_unseen_many(
+        self,
+        category: Optional[object],
+        exclude: Iterable[int],
+        count: int
+    ) -> List[int]:
+        """Draws distinct random question ids which are not in the exclusion
+        list.
+
+        The excluded ids are mapped to bucket positions and skipped over, so
+        the cost depends on the number of excluded and drawn ids, not the
+        bucket size.
+
+        Args:
+            category: The id of the category to draw from, or None for all.
+            exclude: The ids of questions which must not be drawn.
+            count: The maximum number of ids to draw.
+
+        Returns:
+            Up to count question ids, in random order.
+        """
+        with self._lock:
+            self._refresh_if_stale()
+            key = self._key(category)
+            bucket = self._buckets.get(key, [])
+            positions = self._positions.get(key, {})
+            skipped = sorted({positions[question_id]
+                              for question_id in exclude
+                              if question_id in positions})
+            available = len(bucket) - len(skipped)
+            if available <= 0 or count <= 0:
+                return []
+
+            targets = random.sample(range(available), min(count, available))
+            # Shift each target past the skipped positions at or before it
+            shifted = {}
+            passed = 0
+            for target in sorted(targets):
+                while (passed < len(skipped) and
+                       skipped[passed] <= target + passed):
+                    passed += 1
+                shifted[target] = target + passed
+            return [bucket[shifted[target]] for target in targets]
+
+    def random_unseen_weighted(
+        self,
+        category: Optional[object],
+        exclude: Iterable[int],
+        count: int,
+        weights: Callable[[Dict[int, int], int], Dict[int, float]]
+    ) -> List[int]:
+        """Draws distinct random question ids which are not in the exclusion
+        list, each with a likelihood set by its difficulty.
+
+        Each draw first picks a difficulty, weighing each level by the
+        number of its unseen questions, then an unseen question of that
+        level uniformly, by mapping a random rank past the excluded
+        positions of the level's bucket with a binary search. Excluded ids
+        are looked up, never compared against the whole category, so each
+        draw takes O(log k) comparisons for k excluded ids, plus a step per
+        difficulty level, whatever the size of the category.
+        Questions without a difficulty are never drawn.
+
+        Args:
+            category: The id of the category to draw from, or None for all.
+            exclude: The ids of questions which must not be drawn.
+            count: The maximum number of ids to draw.
+            weights: A function of the number of unseen questions of each
+                difficulty and the number of ids drawn so far, returning
+                the weight of each question of a difficulty for the next
+                draw.
+
+        Returns:
+            Up to count question ids, in the order they were drawn.
+        """
+        with self._lock:
+            self._refresh_if_stale()
+            key = self._key(category)
+            skipped: Dict[int, List[int]] = {
+                level: [] for level in self._levels.get(key, {})
+            }
+            for question_id in set(exclude):
+                entry = self._questions.get(question_id)
+                if entry is None or entry[1] is None:
+                    continue
+                position = self._positions.get((key, entry[1]), {})\
+                                          .get(question_id)
+                if position is not None:
+                    skipped[entry[1]].append(position)
+            unseen = {}
+            for level, positions in skipped.items():
+                positions.sort()
+                unseen[level] = (len(self._buckets.get((key, level), [])) -
+                                 len(positions))
+
+            drawn: List[int] = []
+            while len(drawn) < count:
+                level = choose_level(weights(unseen, len(drawn)), unseen)
+                if level is None:
+                    break
+                position = _unskipped_position(
+                    skipped[level],
+                    random.randrange(unseen[level])
+                )
+                insort(skipped[level], position)
+                unseen[level] -= 1
+                drawn.append(self._buckets[(key, level)][position])
+            return drawn
+
+
+question_index = QuestionIndex()
+
+Question.listen('insert', question_index.add)
+Question.listen('insert_many', lambda questions: question_index.invalidate())
+Question.listen('update', lambda question: question_index.invalidate())
+Question.listen('delete', question_index.remove)
+Question.listen('delete_many', question_index.remove_many)
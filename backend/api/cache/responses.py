@@ -0,0 +1,507 @@
+"""Caches of rendered HTTP responses, invalidated by model generations."""
+
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Mapping,
+                    NamedTuple, Optional, Set, Tuple)
+
+from flask import Response, current_app, has_app_context, request
+from werkzeug.http import is_resource_modified
+
+from api.models.model import db
+from api.models.revision import Revision
+
+
+# Write events which change the responses depending on a model
+WRITE_EVENTS = ('insert', 'insert_many', 'update', 'delete', 'delete_many')
+
+# Headers which are not replayed from the cache
+_UNCACHED_HEADERS = {'content-length', 'set-cookie'}
+
+
+def _first_generation() -> int:
+    """Numbers the first generation of a model after the current time in
+    milliseconds, so generations never repeat across restarts of a process
+    or evictions from a shared store."""
+    return int(time.time() * 1000)
+
+
+class CachedResponse(NamedTuple):
+    """The parts of a response kept in the cache."""
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+
+
+class ResponseCacheBackend():
+    """This is the base class for stores of cached responses.
+
+    Besides responses, a backend stores one generation number per model,
+    which is part of the key of every response depending on the model.
+    Bumping a generation therefore invalidates every such response at once,
+    without finding or deleting them; they are left to expire. The time of
+    the last bump is stored as well.
+    """
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Fetches a response, or None if it is missing or has expired."""
+        raise NotImplementedError
+
+    def set(self, key: str, response: CachedResponse, ttl: int) -> None:
+        """Stores a response for ttl seconds."""
+        raise NotImplementedError
+
+    def generation(self, name: str) -> int:
+        """Fetches the current generation of a model."""
+        raise NotImplementedError
+
+    def bump(self, name: str) -> None:
+        """Starts a new generation of a model."""
+        raise NotImplementedError
+
+    def modified(self, name: str) -> float:
+        """Fetches the time a model was last written, as a UNIX timestamp,
+        or the time its generations were first numbered."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        """The number of responses stored, where the backend knows it."""
+        return 0
+
+
+class MemoryBackend(ResponseCacheBackend):
+    """Keeps responses in the memory of the current process.
+
+    Responses are kept in order of last use, and the least recently used
+    response is evicted once the backend holds RESPONSE_CACHE_SIZE of them.
+    Generations are local to the process, so writes made by other processes
+    are only seen once responses expire.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._lock = threading.Lock()
+        self._responses: 'OrderedDict[str, Tuple[float, CachedResponse]]' = \
+            OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._modified: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._responses.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._responses[key]
+                return None
+            self._responses.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, response: CachedResponse, ttl: int) -> None:
+        with self._lock:
+            self._responses[key] = (time.monotonic() + ttl, response)
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.size:
+                self._responses.popitem(last=False)
+
+    def generation(self, name: str) -> int:
+        generation = self._generations.get(name)
+        if generation is None:
+            with self._lock:
+                self._modified.setdefault(name, time.time())
+                generation = self._generations.setdefault(
+                    name,
+                    _first_generation()
+                )
+        return generation
+
+    def bump(self, name: str) -> None:
+        generation = self.generation(name)
+        with self._lock:
+            self._generations[name] = max(generation,
+                                          self._generations[name]) + 1
+            self._modified[name] = time.time()
+
+    def modified(self, name: str) -> float:
+        self.generation(name)
+        return self._modified[name]
+
+
+class NullBackend(MemoryBackend):
+    """Stores no responses, only the generations of models, which are local
+    to the process."""
+
+    def __init__(self) -> None:
+        super().__init__(0)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        return None
+
+    def set(self, key: str, response: CachedResponse, ttl: int) -> None:
+        pass
+
+
+class LocalClient():
+    """Stands in for a memcached client, such as pymemcache's Client, within
+    a single process.
+
+    It implements the subset of the client API used by KeyValueBackend, with
+    values stored as bytes and expiry times in seconds.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[Optional[float], bytes]] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self._values[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: bytes, expire: int = 0) -> bool:
+        with self._lock:
+            expires_at = time.monotonic() + expire if expire else None
+            self._values[key] = (expires_at, value)
+        return True
+
+    def add(self, key: str, value: bytes, expire: int = 0) -> bool:
+        if self.get(key) is not None:
+            return False
+        return self.set(key, value, expire)
+
+    def incr(self, key: str, value: int) -> Optional[int]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            number = int(entry[1]) + value
+            self._values[key] = (entry[0], str(number).encode())
+            return number
+
+
+class KeyValueBackend(ResponseCacheBackend):
+    """Keeps responses and generations in a key-value store shared by every
+    process, through a memcached-style client.
+
+    Args:
+        client: An object with the get, set, add and incr methods of a
+            pymemcache Client.
+    """
+
+    def __init__(self, client: Any) -> None:
+        self.client = client
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        value = self.client.get(key)
+        if value is None:
+            return None
+        head, _, body = value.partition(b'\n')
+        status, headers = json.loads(head)
+        return CachedResponse(status, [tuple(pair) for pair in headers], body)
+
+    def set(self, key: str, response: CachedResponse, ttl: int) -> None:
+        head = json.dumps([response.status, response.headers]).encode()
+        self.client.set(key, head + b'\n' + response.body, expire=ttl)
+
+    def generation(self, name: str) -> int:
+        key = f'generation:{name}'
+        generation = self.client.get(key)
+        if generation is None:
+            self.client.add(f'modified:{name}', str(time.time()).encode())
+            self.client.add(key, str(_first_generation()).encode())
+            generation = self.client.get(key)
+        return int(generation)
+
+    def bump(self, name: str) -> None:
+        key = f'generation:{name}'
+        if self.client.incr(key, 1) is None:
+            self.generation(name)
+            self.client.incr(key, 1)
+        self.client.set(f'modified:{name}', str(time.time()).encode())
+
+    def modified(self, name: str) -> float:
+        key = f'modified:{name}'
+        modified = self.client.get(key)
+        if modified is None:
+            self.client.add(key, str(time.time()).encode())
+            modified = self.client.get(key)
+        return float(modified)
+
+
+# Backend factories, by RESPONSE_CACHE_BACKEND setting
+_backends: Dict[str, Callable[[Mapping[str, Any]],
+                              ResponseCacheBackend]] = {
+    'none': lambda config: NullBackend(),
+    'memory': lambda config: MemoryBackend(config['RESPONSE_CACHE_SIZE']),
+    'local': lambda config: KeyValueBackend(LocalClient()),
+}
+
+
+def register_backend(
+    name: str,
+    factory: Callable[[Mapping[str, Any]], ResponseCacheBackend]
+) -> None:
+    """Makes a backend selectable by the RESPONSE_CACHE_BACKEND setting.
+
+    Args:
+        name: The value of the setting selecting the backend.
+        factory: A function building the backend from the configuration of
+            an application.
+    """
+    _backends[name] = factory
+
+
+class ResponseCache():
+    """Serves repeated GET requests from a cache of their responses.
+
+    Views are decorated with cached(), naming the models their responses are
+    built from. The key of a response combines the request path and query
+    string with the current generation of each of those models, and writes
+    to a model bump its generation, so a response is served until it
+    expires or one of its models is written.
+
+    Views decorated with conditional() carry an ETag built from the
+    revisions of their models' tables, which are stored in the database
+    (see api.models.revision) and so shared by every process, and answer a
+    matching If-None-Match header before doing any other work.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tracked: Set[type] = set()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def backend(self) -> ResponseCacheBackend:
+        """Fetches the backend of the current application, creating it on
+        first use."""
+        extensions = current_app.extensions
+        if 'response_cache' not in extensions:
+            config = current_app.config
+            backend = _backends[config['RESPONSE_CACHE_BACKEND']](config)
+            extensions.setdefault('response_cache', backend)
+        return extensions['response_cache']
+
+    def _track(self, model: type) -> None:
+        """Bumps the generation of a model whenever it is written."""
+        with self._lock:
+            if model in self._tracked:
+                return
+            self._tracked.add(model)
+        for event in WRITE_EVENTS:
+            model.listen(event, lambda _, model=model: self.bump(model))
+
+    def bump(self, model: type) -> None:
+        """Invalidates every cached response built from a model."""
+        if has_app_context():
+            self.backend().bump(model.__tablename__)
+
+    def _key(self, backend: ResponseCacheBackend,
+             models: Iterable[type]) -> str:
+        """Builds the key of the response to the current request."""
+        generations = ','.join(
+            f'{model.__tablename__}:{backend.generation(model.__tablename__)}'
+            for model in models
+        )
+        source = f'{request.full_path}|{generations}'
+        return 'response:' + hashlib.sha1(source.encode()).hexdigest()
+
+    def _written_within_lag(self, backend: ResponseCacheBackend,
+                            models: Iterable[type]) -> bool:
+        """Whether one of models was written so recently that the replicas
+        may not have received the write yet."""
+        written = max(backend.modified(model.__tablename__) for model in models)
+        return time.time() - written < current_app.config['DB_REPLICA_LAG']
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _tee(
+        self,
+        chunks: Iterable[bytes],
+        store: Callable[[bytes], None],
+        limit: int
+    ) -> Iterator[bytes]:
+        """Yields the chunks of a streamed response, storing the whole body
+        once it has been sent, unless it is larger than limit bytes."""
+        body: Optional[List[bytes]] = []
+        size = 0
+        for chunk in chunks:
+            if body is not None:
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                size += len(data)
+                if size <= limit:
+                    body.append(data)
+                else:
+                    body = None
+            yield chunk
+        if body is not None:
+            store(b''.join(body))
+
+    def cached(self, *models: type) -> Callable:
+        """Decorates a view whose GET responses are built from models.
+
+        Only successful responses without a Vary header are cached, for
+        RESPONSE_CACHE_TTL seconds. A cached response carrying an ETag still
+        answers a matching If-None-Match header with 304 Not Modified.
+
+        With read replicas, requests pinned to the primary database are
+        neither served from the cache nor stored in it, and responses built
+        within DB_REPLICA_LAG seconds of a write to one of the models are not
+        stored, since a lagging replica may have built them without it.
+
+        Args:
+            models: The models the responses of the view are built from.
+        """
+        for model in models:
+            self._track(model)
+
+        def decorator(view: Callable[..., Response]) -> Callable:
+            @functools.wraps(view)
+            def wrapper(*args: Any, **kwargs: Any) -> Response:
+                backend = self.backend()
+                replicated = bool(db.replica_engines(current_app))
+                if request.method != 'GET' or \
+                        (replicated and db.session().use_primary):
+                    return view(*args, **kwargs)
+
+                key = self._key(backend, models)
+                entry = backend.get(key)
+                if entry is not None:
+                    self._count('hits')
+                    response = current_app.response_class(
+                        entry.body,
+                        status=entry.status,
+                        headers=entry.headers
+                    )
+                    return response.make_conditional(request)
+
+                self._count('misses')
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or \
+                        'Vary' in response.headers or \
+                        (replicated and
+                         self._written_within_lag(backend, models)):
+                    return response
+
+                config = current_app.config
+                ttl = config['RESPONSE_CACHE_TTL']
+                headers = [(name, value)
+                           for name, value in response.headers
+                           if name.lower() not in _UNCACHED_HEADERS]
+
+                def store(body: bytes) -> None:
+                    backend.set(key, CachedResponse(200, headers, body), ttl)
+                    self._count('stores')
+
+                if response.is_streamed:
+                    response.response = self._tee(
+                        response.response,
+                        store,
+                        config['RESPONSE_CACHE_MAX_BYTES']
+                    )
+                elif (response.content_length or 0) <= \
+                        config['RESPONSE_CACHE_MAX_BYTES']:
+                    store(response.get_data())
+                return response
+            return wrapper
+        return decorator
+
+    def revision(
+        self,
+        models: Iterable[type]
+    ) -> Tuple[str, Optional[datetime]]:
+        """Identifies the current revision of the responses built from
+        models, in a single query.
+
+        Returns:
+            An entity tag combining the revisions of the models' tables, and
+            the time the most recently written of them was last written, or
+            None if none of them was ever written.
+        """
+        names = [model.__tablename__ for model in models]
+        revisions = Revision.fetch_current(names)
+        etag = '-'.join(str(revisions.get(name, (0, None))[0])
+                        for name in names)
+        if not revisions:
+            return etag, None
+        modified = max(modified for _, modified in revisions.values())
+        return etag, datetime.utcfromtimestamp(modified)
+
+    def conditional(self, *models: type) -> Callable:
+        """Decorates a view whose GET responses are built from models with
+        validators and Cache-Control headers.
+
+        The ETag and Last-Modified headers of the responses are derived from
+        the revisions of the models' tables, so a request whose If-None-Match
+        or If-Modified-Since header is still current is answered with 304 Not
+        Modified without running the view, after a single query. Clients may
+        reuse responses for HTTP_CACHE_MAX_AGE seconds before they must
+        revalidate them.
+
+        Args:
+            models: The models the responses of the view are built from.
+        """
+        for model in models:
+            self._track(model)
+
+        def decorator(view: Callable[..., Response]) -> Callable:
+            @functools.wraps(view)
+            def wrapper(*args: Any, **kwargs: Any) -> Response:
+                if request.method not in ('GET', 'HEAD'):
+                    return view(*args, **kwargs)
+
+                etag, last_modified = self.revision(models)
+                if is_resource_modified(
+                        request.environ,
+                        etag=etag,
+                        last_modified=last_modified):
+                    response = current_app.make_response(
+                        view(*args, **kwargs)
+                    )
+                    if response.status_code != 200:
+                        return response
+                else:
+                    response = current_app.response_class(status=304)
+
+                response.set_etag(etag)
+                response.last_modified = last_modified
+                response.cache_control.public = True
+                response.cache_control.max_age = \
+                    current_app.config['HTTP_CACHE_MAX_AGE']
+                response.cache_control.must_revalidate = True
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self) -> Dict[str, Any]:
+        """Reports the hits and misses of the cache in this process."""
+        backend = self.backend()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': current_app.config['RESPONSE_CACHE_BACKEND'],
+                'entries': len(backend),
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'hit_ratio': self.hits / lookups if lookups else None,
+            }
+
+
+response_cache = ResponseCache()
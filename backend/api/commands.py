@@ -0,0 +1,91 @@
+"""Command line interface of the trivia application."""
+
+import json
+import sys
+from itertools import chain
+
+import click
+from flask import Blueprint
+from flask.cli import with_appcontext
+
+from api.bulk import import_questions, parse_ndjson
+from api.migrations import (benchmark_category_queries,
+                            migrate_question_category,
+                            migrate_question_search)
+from api.models.model import db
+
+
+@click.command('import-questions')
+@with_appcontext
+@click.argument('source', type=click.File('rb'))
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Number of questions to insert per transaction.')
+def import_questions_command(source, batch_size: int) -> None:
+    """Imports questions from a JSON array or NDJSON file.
+
+    Pass '-' as SOURCE to read from standard input.
+    """
+    lines = iter(source)
+    first = next((line for line in lines if line.strip()), b'')
+    if first.lstrip().startswith(b'['):
+        records = json.loads(first + source.read())
+    else:
+        records = parse_ndjson(chain([first], lines))
+
+    result = import_questions(records, batch_size)
+    for error in result.errors:
+        click.echo(f'Row {error.row}: {error.message}', err=True)
+    click.echo(f'Imported {result.inserted} questions, '
+               f'{len(result.errors)} failed.')
+    if result.errors:
+        sys.exit(1)
+
+
+@click.command('migrate-question-category')
+@with_appcontext
+@click.option('--batch-size', default=10000, show_default=True,
+              help='Number of question ids to backfill per statement.')
+@click.option('--benchmark', is_flag=True,
+              help='Time the category queries before and after migrating.')
+@click.option('--repeat', default=100, show_default=True,
+              help='Number of times to run each benchmarked query.')
+def migrate_question_category_command(batch_size: int, benchmark: bool,
+                                      repeat: int) -> None:
+    """Turns the category of questions into an indexed integer foreign key.
+
+    The migration can be rerun safely; steps already applied are skipped.
+    """
+    if benchmark:
+        before = benchmark_category_queries(db.engine, repeat)
+
+    migrate_question_category(db.engine, batch_size, click.echo)
+
+    if benchmark:
+        after = benchmark_category_queries(db.engine, repeat)
+        click.echo(f'{"query":<16}{"before ms":>12}{"after ms":>12}')
+        for name in before:
+            click.echo(f'{name:<16}{before[name]:>12.3f}{after[name]:>12.3f}')
+
+
+@click.command('init-db')
+@click.option('--batch-size', default=10000, show_default=True,
+              help='Number of question ids to backfill per statement.')
+@with_appcontext
+def init_db_command(batch_size: int) -> None:
+    """Creates any missing tables and migrates existing ones.
+
+    Run this once per deployment, before starting the workers: production
+    workers do not create tables themselves (see DB_CREATE_ALL).
+    """
+    db.create_all()
+    click.echo('Created any missing tables.')
+    migrate_question_category(db.engine, batch_size, click.echo)
+    migrate_question_search(db.engine, click.echo)
+
+
+def register(blueprint: Blueprint) -> None:
+    """Adds the command line interface to a blueprint."""
+    for command in (import_questions_command,
+                    migrate_question_category_command,
+                    init_db_command):
+        blueprint.cli.add_command(command)
@@ -0,0 +1,40 @@
+"""Encodes values as JSON, using orjson when it is installed."""
+
+import json
+from typing import Any, NamedTuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class Fragment(NamedTuple):
+    """A value which has already been encoded as JSON.
+
+    Fragments are spliced verbatim into the top level of responses built by
+    api.resources.responses, so data which rarely changes, such as the list
+    of categories, is only encoded once.
+    """
+    data: bytes
+
+
+def dumps(value: Any) -> bytes:
+    """Encodes a value as compact JSON with sorted keys, as jsonify does.
+
+    Args:
+        value: The value to encode. Dictionary keys may be integers.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            value,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+        )
+    return json.dumps(value, sort_keys=True, separators=(',', ':')).encode()
+
+
+def encode(value: Any) -> bytes:
+    """Encodes a value as JSON, unless it is an already encoded Fragment."""
+    if isinstance(value, Fragment):
+        return value.data
+    return dumps(value)
@@ -1,16 +1,14 @@
 """HTTP response error handlers."""
 
-from flask import current_app, jsonify
+from flask import Blueprint, jsonify
 
-@current_app.errorhandler(400)
-def not_found(error):
+def bad_request(error):
     return jsonify({
         'success': False,
         'error': 400,
         'message': 'Request not understood.',
     }), 400
 
-@current_app.errorhandler(404)
 def not_found(error):
     return jsonify({
         'success': False,
@@ -18,7 +16,6 @@ def not_found(error):
         'message': 'Resource not found.',
     }), 404
 
-@current_app.errorhandler(405)
 def method_not_allowed(error):
     return jsonify({
         'success': False,
@@ -26,7 +23,6 @@ def method_not_allowed(error):
         'message': 'Method not allowed.',
     }), 405
 
-@current_app.errorhandler(422)
 def unprocessable(error):
     return jsonify({
         'success': False,
@@ -34,10 +30,19 @@ def unprocessable(error):
         'message': 'Unprocessable request.',
     }), 422
 
-@current_app.errorhandler(500)
 def server_error(error):
     return jsonify({
         'success': False,
         'error': 500,
         'message': 'Internal server error.',
     }), 500
+
+
+def register(blueprint: Blueprint) -> None:
+    """Adds the error handlers of the whole application to a blueprint."""
+    for code, handler in ((400, bad_request),
+                          (404, not_found),
+                          (405, method_not_allowed),
+                          (422, unprocessable),
+                          (500, server_error)):
+        blueprint.app_errorhandler(code)(handler)
@@ -0,0 +1,290 @@
+"""Measures the queries, serialization time and latency of each request."""
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import (Flask, Response, current_app, g, has_app_context,
+                   has_request_context, request)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Upper bounds of the request latency histogram, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RequestTimings():
+    """The measurements of the request being served."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = 0
+        self.statements: Counter = Counter()
+
+
+class EndpointStats():
+    """The measurements of every request served by one endpoint."""
+
+    def __init__(self) -> None:
+        self.requests: Counter = Counter()
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+
+    def add(self, method: str, status: int, latency: float,
+            timings: RequestTimings) -> None:
+        """Adds the measurements of one request."""
+        self.requests[(method, status)] += 1
+        position = bisect_left(LATENCY_BUCKETS, latency)
+        if position < len(self.buckets):
+            self.buckets[position] += 1
+        self.latency += latency
+        self.queries += timings.queries
+        self.db_time += timings.db_time
+        self.serialize_time += timings.serialize_time
+
+
+def _labels(**labels: Any) -> str:
+    """Formats Prometheus labels, escaping their values."""
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                                         .replace('"', '\\"')
+                                         .replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+class Instrumentation():
+    """Counts the SQL statements, database time, serialization time and
+    latency of each request, per endpoint.
+
+    Statements are timed through the cursor events of the engines, and
+    requests through the request hooks of the application. Each buffered
+    response reports its own measurements in a Server-Timing header, and
+    the totals of the process are rendered in the Prometheus text format.
+    Streamed responses run queries and serialize rows while they are sent,
+    after their headers, so they carry no Server-Timing header and are only
+    counted in the totals once they have been sent. Statements
+    slower than SLOW_QUERY_MS are logged, as is any statement run at least
+    N_PLUS_ONE_THRESHOLD times by a single request, the mark of a query run
+    once per item of an earlier result.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.slow_queries = 0
+        self.repeated_queries = 0
+
+    def init_app(self, app: Flask, engines: Iterable[Engine]) -> None:
+        """Starts measuring the requests of an application and the
+        statements run on its engines."""
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute',
+                         self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute',
+                         self._after_cursor_execute)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    @staticmethod
+    def current() -> Optional[RequestTimings]:
+        """Fetches the measurements of the request being served, if any."""
+        if has_request_context():
+            return g.get('request_timings')
+        return None
+
+    def _before_request(self) -> None:
+        g.request_timings = RequestTimings()
+
+    def _record(self, endpoint: str, method: str, status: int,
+                timings: RequestTimings) -> float:
+        """Adds the measurements of a request to the totals of its endpoint.
+
+        Returns:
+            The latency of the request, in seconds.
+        """
+        latency = time.perf_counter() - timings.started
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            stats.add(method, status, latency, timings)
+        return latency
+
+    def _after_request(self, response: Response) -> Response:
+        timings = self.current()
+        if timings is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        if response.is_streamed:
+            response.call_on_close(functools.partial(
+                self._record,
+                endpoint,
+                request.method,
+                response.status_code,
+                timings
+            ))
+            return response
+
+        latency = self._record(endpoint, request.method,
+                               response.status_code, timings)
+        if current_app.config['SERVER_TIMING']:
+            response.headers['Server-Timing'] = ', '.join((
+                f'db;dur={timings.db_time * 1000:.2f};'
+                f'desc="{timings.queries} queries"',
+                f'serialize;dur={timings.serialize_time * 1000:.2f}',
+                f'total;dur={latency * 1000:.2f}',
+            ))
+        return response
+
+    def _before_cursor_execute(self, conn: Any, cursor: Any, statement: str,
+                               parameters: Any, context: Any,
+                               executemany: bool) -> None:
+        conn.info['query_started'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn: Any, cursor: Any, statement: str,
+                              parameters: Any, context: Any,
+                              executemany: bool) -> None:
+        elapsed = time.perf_counter() - conn.info.pop('query_started')
+        if not has_app_context():
+            return
+        config = current_app.config
+        if elapsed * 1000 >= config['SLOW_QUERY_MS']:
+            with self._lock:
+                self.slow_queries += 1
+            current_app.logger.warning(
+                'Slow query (%.1f ms) on %s: %s',
+                elapsed * 1000,
+                request.endpoint if has_request_context() else None,
+                statement
+            )
+
+        timings = self.current()
+        if timings is None:
+            return
+        timings.queries += 1
+        timings.db_time += elapsed
+        timings.statements[statement] += 1
+        if timings.statements[statement] == config['N_PLUS_ONE_THRESHOLD']:
+            with self._lock:
+                self.repeated_queries += 1
+            current_app.logger.warning(
+                'Possible N+1 queries on %s: statement run %d times: %s',
+                request.endpoint,
+                config['N_PLUS_ONE_THRESHOLD'],
+                statement
+            )
+
+    @contextmanager
+    def serializing(self) -> Iterator[None]:
+        """Counts the time spent in the context towards the serialization
+        time of the current request. Nested contexts are counted once."""
+        timings = self.current()
+        if timings is None:
+            yield
+            return
+        timings.serializing += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings.serializing -= 1
+            if not timings.serializing:
+                timings.serialize_time += time.perf_counter() - started
+
+    def query_count(self) -> int:
+        """Counts the SQL statements run by every request recorded so far."""
+        with self._lock:
+            return sum(stats.queries for stats in self.endpoints.values())
+
+    def render(
+        self,
+        gauges: Iterable[Tuple[str, str, float]] = (),
+        counters: Iterable[Tuple[str, str, float]] = ()
+    ) -> str:
+        """Renders the measurements of this process in the Prometheus text
+        exposition format.
+
+        Args:
+            gauges: Extra (name, help, value) gauges to include.
+            counters: Extra (name, help, value) counters to include, whose
+                names end with '_total'.
+        """
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            lines: List[str] = [
+                '# HELP trivia_requests_total Requests served.',
+                '# TYPE trivia_requests_total counter',
+            ]
+            for endpoint, stats in endpoints:
+                for (method, status), count in sorted(stats.requests.items()):
+                    labels = _labels(endpoint=endpoint, method=method,
+                                     status=status)
+                    lines.append(f'trivia_requests_total{labels} {count}')
+
+            lines += [
+                '# HELP trivia_request_duration_seconds Request latency.',
+                '# TYPE trivia_request_duration_seconds histogram',
+            ]
+            for endpoint, stats in endpoints:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    cumulative += count
+                    labels = _labels(endpoint=endpoint, le=bound)
+                    lines.append(f'trivia_request_duration_seconds_bucket'
+                                 f'{labels} {cumulative}')
+                total = sum(stats.requests.values())
+                labels = _labels(endpoint=endpoint, le='+Inf')
+                lines.append(f'trivia_request_duration_seconds_bucket'
+                             f'{labels} {total}')
+                labels = _labels(endpoint=endpoint)
+                lines.append(f'trivia_request_duration_seconds_sum'
+                             f'{labels} {stats.latency:.6f}')
+                lines.append(f'trivia_request_duration_seconds_count'
+                             f'{labels} {total}')
+
+            for name, description, attribute in (
+                ('trivia_request_queries_total', 'SQL statements run.',
+                 'queries'),
+                ('trivia_request_db_seconds_total',
+                 'Time spent running SQL statements.', 'db_time'),
+                ('trivia_request_serialization_seconds_total',
+                 'Time spent serializing responses.', 'serialize_time'),
+            ):
+                lines += [f'# HELP {name} {description}',
+                          f'# TYPE {name} counter']
+                for endpoint, stats in endpoints:
+                    value = getattr(stats, attribute)
+                    lines.append(f'{name}{_labels(endpoint=endpoint)} {value}')
+
+            for name, description, value in (
+                ('trivia_slow_queries_total',
+                 'SQL statements slower than SLOW_QUERY_MS.',
+                 self.slow_queries),
+                ('trivia_repeated_queries_total',
+                 'Statements run N_PLUS_ONE_THRESHOLD times by a request.',
+                 self.repeated_queries),
+            ):
+                lines += [f'# HELP {name} {description}',
+                          f'# TYPE {name} counter',
+                          f'{name} {value}']
+
+        for kind, metrics in (('gauge', gauges), ('counter', counters)):
+            for name, description, value in metrics:
+                lines += [f'# HELP {name} {description}',
+                          f'# TYPE {name} {kind}',
+                          f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+instrumentation = Instrumentation()
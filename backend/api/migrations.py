@@ -0,0 +1,233 @@
+"""Migrates existing databases to the current question schema."""
+
+import time
+from typing import Callable, Dict, List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from api.models.category import Category
+from api.models.question import Question
+
+
+CATEGORY_INDEX = 'ix_questions_category_id'
+CATEGORY_FOREIGN_KEY = 'category'
+SEARCH_INDEX = 'ix_questions_question_trgm'
+
+# Queries whose plans change once the category is an indexed integer
+BENCHMARK_QUERIES: Dict[str, str] = {
+    'category page': (
+        'SELECT id, question, answer, category, difficulty FROM questions '
+        'WHERE category = :category AND id > :after ORDER BY id LIMIT 10'
+    ),
+    'category count': (
+        'SELECT count(id) FROM questions WHERE category = :category'
+    ),
+    'quiz bucket': (
+        'SELECT id FROM questions WHERE category = :category'
+    ),
+}
+
+
+def _is_integer(engine: Engine) -> bool:
+    """Whether the category column of the questions table is an integer."""
+    for column in inspect(engine).get_columns(Question.__tablename__):
+        if column['name'] == 'category':
+            return column['type'].python_type is int
+    return False
+
+
+def _has_foreign_key(engine: Engine) -> bool:
+    """Whether the category column references the categories table."""
+    return any(
+        key['constrained_columns'] == ['category']
+        for key in inspect(engine).get_foreign_keys(Question.__tablename__)
+    )
+
+
+def _has_index(engine: Engine, name: str = CATEGORY_INDEX) -> bool:
+    """Whether an index of the questions table exists."""
+    return any(
+        index['name'] == name
+        for index in inspect(engine).get_indexes(Question.__tablename__)
+    )
+
+
+def _backfill(engine: Engine, batch_size: int,
+              log: Callable[[str], None]) -> None:
+    """Replaces category types stored in place of ids with the ids, and
+    clears categories which match no category, one batch of ids at a time.
+
+    Each batch is committed in a transaction of its own, so the rows of a
+    batch are only locked while it is updated, and writes to the rest of the
+    table proceed meanwhile."""
+    with engine.connect() as connection:
+        last_id = connection.execute(text(
+            'SELECT coalesce(max(id), 0) FROM questions'
+        )).scalar()
+    resolved = cleared = 0
+    for start in range(0, last_id, batch_size):
+        bounds = {'start': start, 'end': start + batch_size}
+        with engine.begin() as connection:
+            resolved += connection.execute(text(
+                'UPDATE questions SET category = ('
+                '  SELECT CAST(categories.id AS TEXT) FROM categories'
+                '  WHERE lower(categories.type) = lower(questions.category))'
+                ' WHERE id > :start AND id <= :end'
+                '  AND lower(category) IN (SELECT lower(type) FROM categories)'
+            ), bounds).rowcount
+            cleared += connection.execute(text(
+                'UPDATE questions SET category = NULL'
+                ' WHERE id > :start AND id <= :end AND category NOT IN ('
+                '  SELECT CAST(id AS TEXT) FROM categories)'
+            ), bounds).rowcount
+    log(f'Backfilled {resolved} category ids from their types, '
+        f'cleared {cleared} unknown categories.')
+
+
+def migrate_question_category(
+    engine: Engine,
+    batch_size: int = 10000,
+    log: Callable[[str], None] = print
+) -> None:
+    """Turns the category of questions into an indexed integer foreign key.
+
+    Each step is skipped if it has already been applied, so the migration
+    can be rerun safely, and a database created from the current models is
+    left unchanged. Stored values are backfilled in batches, each committed
+    on its own. On PostgreSQL, the column type is then changed in a separate
+    transaction, which rewrites the table under an exclusive lock; if a
+    category type was written since its batch, the change fails and leaves
+    the column as it was, and rerunning the migration backfills it. The
+    foreign key is validated without blocking writes, and the index is built
+    concurrently. SQLite cannot change column types or add constraints, so
+    only the stored values and the index are migrated there; its text
+    columns still match integer ids, which it compares as text.
+
+    Args:
+        engine: The engine of the primary database.
+        batch_size: The number of question ids to backfill per transaction.
+        log: A function reporting the progress of the migration.
+    """
+    postgresql = engine.dialect.name == 'postgresql'
+
+    if _is_integer(engine):
+        log('Question categories are already integers.')
+    else:
+        _backfill(engine, batch_size, log)
+        if postgresql:
+            with engine.begin() as connection:
+                connection.execute(text(
+                    'ALTER TABLE questions ALTER COLUMN category '
+                    'TYPE integer USING category::integer'
+                ))
+            log('Converted question categories to integers.')
+        else:
+            log(f'Kept the category column type on {engine.dialect.name}.')
+
+    if _has_foreign_key(engine):
+        log('Question categories already reference categories.')
+    elif postgresql:
+        with engine.begin() as connection:
+            connection.execute(text(
+                f'ALTER TABLE questions ADD CONSTRAINT {CATEGORY_FOREIGN_KEY}'
+                ' FOREIGN KEY (category) REFERENCES categories (id)'
+                ' ON UPDATE CASCADE ON DELETE SET NULL NOT VALID'
+            ))
+        with engine.begin() as connection:
+            connection.execute(text(
+                f'ALTER TABLE questions VALIDATE CONSTRAINT '
+                f'{CATEGORY_FOREIGN_KEY}'
+            ))
+        log('Added the category foreign key.')
+    else:
+        log(f'Skipped the category foreign key on {engine.dialect.name}.')
+
+    if _has_index(engine):
+        log(f'Index {CATEGORY_INDEX} already exists.')
+    else:
+        concurrently = ' CONCURRENTLY' if postgresql else ''
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level='AUTOCOMMIT')\
+                      .execute(text(
+                          f'CREATE INDEX{concurrently} {CATEGORY_INDEX}'
+                          ' ON questions (category, id)'
+                      ))
+        log(f'Created index {CATEGORY_INDEX}.')
+
+    with engine.connect() as connection:
+        connection.execution_options(isolation_level='AUTOCOMMIT')\
+                  .execute(text('ANALYZE questions'))
+
+
+def migrate_question_search(
+    engine: Engine,
+    log: Callable[[str], None] = print
+) -> None:
+    """Adds the trigram index serving question searches on PostgreSQL.
+
+    Databases created before the index was added to the models lack both
+    the pg_trgm extension, whose similarity() function ranks the results of
+    Question.search, and the index. Both steps can be rerun safely, and the
+    index is built concurrently, without blocking writes. Other databases
+    need neither, and are left unchanged.
+
+    Args:
+        engine: The engine of the primary database.
+        log: A function reporting the progress of the migration.
+    """
+    if engine.dialect.name != 'postgresql':
+        log(f'Skipped the trigram search index on {engine.dialect.name}.')
+        return
+
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+        connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        log('Enabled the pg_trgm extension.')
+        if _has_index(engine, SEARCH_INDEX):
+            log(f'Index {SEARCH_INDEX} already exists.')
+            return
+        connection.execute(text(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {SEARCH_INDEX}'
+            ' ON questions USING gin (question gin_trgm_ops)'
+        ))
+        log(f'Created index {SEARCH_INDEX}.')
+
+
+def benchmark_category_queries(
+    engine: Engine,
+    repeat: int = 100
+) -> Dict[str, float]:
+    """Times the queries which filter questions by category.
+
+    Each query runs once per category per repetition, with the category
+    bound as the column stores it: as text before the migration, and as an
+    integer after it.
+
+    Args:
+        engine: The engine of the database to benchmark.
+        repeat: The number of times to run each query per category.
+
+    Returns:
+        The mean duration of each query, in milliseconds.
+    """
+    convert = int if _is_integer(engine) else str
+    with engine.connect() as connection:
+        categories: List[object] = [
+            convert(row[0]) for row in connection.execute(text(
+                f'SELECT id FROM {Category.__tablename__}'
+            ))
+        ]
+        timings = {}
+        for name, query in BENCHMARK_QUERIES.items():
+            statement = text(query)
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for category in categories:
+                    connection.execute(
+                        statement,
+                        {'category': category, 'after': 0}
+                    ).fetchall()
+            elapsed = time.perf_counter() - started
+            timings[name] = elapsed * 1000 / max(repeat * len(categories), 1)
+    return timings
@@ -2,7 +2,7 @@
 
 from typing import Any, Dict, Optional
 
-from api.models.model import db, Model
+from api.models.model import db, Model, read_only
 
 
 class Category(Model):
@@ -16,6 +16,7 @@ class Category(Model):
         return f'<Category {self.id} {self.type}>'
 
     @classmethod
+    @read_only
     def fetch_all(
         cls,
         order_by: Optional[object] = None
@@ -28,9 +29,11 @@ class Category(Model):
         Returns:
             An ordered dict of all categories or None.
         """
-        categories = cls.query.order_by(order_by).all()
+        categories = db.session.query(cls.id, cls.type)\
+                               .order_by(order_by)\
+                               .all()
         if categories:
-            return {category.id: category.type for category in categories}
+            return dict(categories)
 
 #    @classmethod
 #    def validate_all(cls, json: Dict[str, Any]) -> None:
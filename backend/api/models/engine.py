@@ -0,0 +1,120 @@
+"""Configures the database engine and measures its connection pool."""
+
+import threading
+from typing import Any, Dict, Iterable, Mapping
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+
+def engine_options(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """Builds the SQLALCHEMY_ENGINE_OPTIONS of an application from its DB_*
+    settings.
+
+    Pool settings only apply to PostgreSQL. Behind PgBouncer (DB_PGBOUNCER),
+    connections are not pooled by the application, and the statement timeout
+    must be set on the database role instead, since PgBouncer rejects it as
+    a startup parameter.
+
+    Args:
+        config: The configuration of the application.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if not uri.startswith('postgres'):
+        return options
+
+    # Send each executemany batch as a single multi-row INSERT
+    options.setdefault('executemany_mode', 'values')
+    options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+    if config['DB_PGBOUNCER']:
+        options.setdefault('poolclass', NullPool)
+        return options
+
+    options.setdefault('pool_size', config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+    if config['DB_STATEMENT_TIMEOUT']:
+        connect_args = options.setdefault('connect_args', {})
+        connect_args.setdefault(
+            'options',
+            f'-c statement_timeout={config["DB_STATEMENT_TIMEOUT"]}'
+        )
+    return options
+
+
+class PoolMetrics():
+    """Counts the connections opened and checked out by an engine's pool.
+
+    The high-water mark of checked-out connections shows how many
+    connections the workers of a process actually need at once. Each engine
+    is measured by a PoolMetrics of its own (see attach_pool_metrics).
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self._lock = threading.Lock()
+        self.engine = engine
+        self.connects = 0
+        self.checkouts = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+
+    def _on_connect(self, dbapi_connection: Any, record: Any) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection: Any, record: Any,
+                     proxy: Any) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def _on_checkin(self, dbapi_connection: Any, record: Any) -> None:
+        with self._lock:
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Reports the current state and counters of the engine's pool."""
+        pool = self.engine.pool
+        with self._lock:
+            metrics = {
+                'pool': type(pool).__name__,
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checked_out': self.checked_out,
+                'max_checked_out': self.max_checked_out,
+            }
+        # Only queue pools report their size and overflow
+        for name, key in (('size', 'pool_size'),
+                          ('checkedin', 'checked_in'),
+                          ('overflow', 'overflow')):
+            method = getattr(pool, name, None)
+            if method is not None:
+                metrics[key] = method()
+        return metrics
+
+
+def attach_pool_metrics(app: Flask, engines: Iterable[Engine]) -> None:
+    """Starts measuring the pool of each engine of an application, keeping
+    the metrics of each engine apart in the extensions of the application.
+
+    Args:
+        app: The application the engines belong to.
+        engines: The engines to measure.
+    """
+    metrics = app.extensions.setdefault('pool_metrics', {})
+    for engine in engines:
+        if engine not in metrics:
+            metrics[engine] = PoolMetrics(engine)
+
+
+def pool_metrics(app: Flask, engine: Engine) -> PoolMetrics:
+    """Fetches the metrics of the pool of an engine of an application."""
+    return app.extensions['pool_metrics'][engine]
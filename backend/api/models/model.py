@@ -1,13 +1,63 @@
 """Defines the base Model from which all other models inherit."""
 
 import datetime
+import functools
+import inspect
 
+from collections import defaultdict
 from decimal import Decimal
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy import BaseQuery, SQLAlchemy
 from sqlalchemy.ext.declarative import as_declarative
 
+from api.models.routing import RoutingSQLAlchemy
+from api.models.serializer import row_serializer, serialize_rows
+
+
+# Write-event callbacks, keyed by (model class, event name)
+_listeners: Dict[Tuple[type, str], List[Callable[[Any], None]]] = \
+    defaultdict(list)
+
+# Key of the session info listing the tables written by its transaction
+WRITTEN_TABLES = 'written_tables'
+
+
+def _dispatch(model: type, event: str, payload: Any) -> None:
+    """Runs every callback registered for a write event on a model."""
+    for cls in model.__mro__:
+        for callback in _listeners.get((cls, event), ()):
+            callback(payload)
+
+
+def mark_written(table_name: str) -> None:
+    """Records that the current transaction wrote to a table through a core
+    statement, which session events do not see (see api.models.revision).
+
+    Args:
+        table_name: The name of the table written.
+    """
+    db.session().info.setdefault(WRITTEN_TABLES, set()).add(table_name)
+
+
+def read_only(method: Callable) -> Callable:
+    """Runs the queries of a method on a read replica, if there is one.
+
+    Generator methods keep reading from the replica until they are exhausted.
+    """
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator(*args: Any, **kwargs: Any) -> Iterator[Any]:
+            with db.reading():
+                yield from method(*args, **kwargs)
+        return generator
+
+    @functools.wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with db.reading():
+            return method(*args, **kwargs)
+    return wrapper
+
 
 @as_declarative()
 class Model():
@@ -35,22 +85,98 @@ class Model():
         """Deletes this resource from the database."""
         db.session.delete(self)
         db.session.commit()
+        self.notify('delete')
 
     def insert(self) -> None:
         """Inserats this resource into the database."""
         db.session.add(self)
         db.session.commit()
+        self.notify('insert')
+
+    def notify(self, event: str) -> None:
+        """Runs every callback registered for a write event on this resource.
+
+        Args:
+            event: The name of the write event ('insert', 'update' or
+                'delete').
+        """
+        _dispatch(type(self), event, self)
 
     def update(self, **attributes: Any) -> None:
-        """Updates this resource with new data and saves it to the database."""
+        """Updates this resource with new data and saves it to the database.
+
+        The values the updated attributes held before are kept in the
+        previous attribute of the resource, for the callbacks of the 'update'
+        event.
+        """
+        self.previous = {k: getattr(self, k, None) for k in attributes}
         for k, v in attributes.items():
             if 'date' in k:
                 setattr(self, k, datetime.date.fromisoformat(v))
             else:
                 setattr(self, k, v)
         db.session.commit()
+        self.notify('update')
 
     @classmethod
+    def insert_many(cls, resources: List[Dict[str, Any]]) -> None:
+        """Inserts several resources into the database in one transaction,
+        with a single executemany statement.
+
+        Args:
+            resources: The column values of each resource to insert.
+        """
+        if not resources:
+            return
+        db.session.execute(cls.__table__.insert(), resources)
+        mark_written(cls.__tablename__)
+        db.session.commit()
+        cls.notify_many('insert_many', resources)
+
+    @classmethod
+    def listen(
+        cls,
+        event: str,
+        callback: Callable[[Any], None]
+    ) -> None:
+        """Registers a callback to run after resources of this type have been
+        written to the database.
+
+        Args:
+            event: The name of the write event. Callbacks for 'insert',
+                'update' and 'delete' receive the written resource, while
+                callbacks for 'insert_many' receive the list of column values
+                passed to insert_many, and callbacks for 'delete_many'
+                receive the dictionaries of the resources deleted.
+            callback: A function which receives the written data.
+        """
+        _listeners[(cls, event)].append(callback)
+
+    @classmethod
+    def notify_many(cls, event: str, resources: List[Any]) -> None:
+        """Runs every callback registered for a bulk write event on this type
+        of resource.
+
+        Args:
+            event: The name of the bulk write event ('insert_many' or
+                'delete_many').
+            resources: The data written.
+        """
+        _dispatch(cls, event, resources)
+
+    @classmethod
+    def select_rows(cls) -> BaseQuery:
+        """Starts a query for the columns of this resource, in table order.
+
+        The query returns plain rows rather than model instances, which skips
+        the ORM identity map; rows are turned into dictionaries by the
+        compiled serializer of the model (see api.models.serializer).
+        """
+        return db.session.query(*(getattr(cls, column)
+                                  for column in cls.__table__.columns.keys()))
+
+    @classmethod
+    @read_only
     def count_all(cls) -> int:
         """Fetches the total stored quantity of a resource.
 
@@ -76,13 +202,57 @@ class Model():
         except:
             error = True
             db.session.rollback()
-        finally:
-            db.session.close()
 
         if not error:
             return resource_id
 
     @classmethod
+    def delete_by_ids(
+        cls,
+        resource_ids: List[int]
+    ) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Deletes several resources by id in a single transaction.
+
+        On PostgreSQL, this is a single DELETE ... RETURNING statement.
+        Elsewhere, the resources are selected before they are deleted.
+
+        Args:
+            resource_ids: The ids of the resources to be deleted.
+
+        Returns:
+            The deleted resources, and the ids of those which did not exist.
+        """
+        resource_ids = list(dict.fromkeys(resource_ids))
+        if not resource_ids:
+            return [], []
+
+        table = cls.__table__
+        statement = table.delete().where(table.c.id.in_(resource_ids))
+        try:
+            if db.engine.dialect.name == 'postgresql':
+                rows = db.session.execute(
+                    statement.returning(*table.columns)
+                ).fetchall()
+            else:
+                rows = cls.select_rows()\
+                          .filter(cls.id.in_(resource_ids))\
+                          .all()
+                db.session.execute(statement)
+            mark_written(cls.__tablename__)
+            db.session.commit()
+        except:
+            db.session.rollback()
+            raise
+
+        resources = serialize_rows(cls, rows)
+        deleted = {resource['id'] for resource in resources}
+        cls.notify_many('delete_many', resources)
+        return resources, [resource_id
+                           for resource_id in resource_ids
+                           if resource_id not in deleted]
+
+    @classmethod
+    @read_only
     def fetch_all(
         cls,
         order_by: Optional[object] = None
@@ -95,11 +265,12 @@ class Model():
         Returns:
             An ordered list of all matching resources or None.
         """
-        resources = cls.query.order_by(order_by).all()
+        resources = cls.select_rows().order_by(order_by).all()
         if resources:
-            return [resource.json() for resource in resources]
+            return serialize_rows(cls, resources)
 
     @classmethod
+    @read_only
     def fetch_all_filtered(
             cls,
             filter_by: object,
@@ -114,11 +285,47 @@ class Model():
         Returns:
             A filtered and ordered list of all matching resources or None.
         """
-        resources = cls.query.filter_by(**filter_by).order_by(order_by).all()
+        resources = cls.select_rows()\
+                       .filter_by(**filter_by)\
+                       .order_by(order_by)\
+                       .all()
         if resources:
-            return [resource.json() for resource in resources]
+            return serialize_rows(cls, resources)
 
     @classmethod
+    @read_only
+    def fetch_stream(
+            cls,
+            filter_by: Optional[object] = None,
+            order_by: Optional[object] = None,
+            batch_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """Fetches all of a resource, ordered and optionally filtered, one
+        batch of rows at a time.
+
+        Rows are read through a server-side cursor where the database
+        supports one, so memory use does not grow with the result size.
+
+        Args:
+            filter_by: SQLAlchemy filtering criterion (see SQLAlchemy docs)
+            order_by: SQLAlchemy ORDER BY criterion (see SQLAlchemy docs)
+            batch_size: The number of rows to fetch at a time.
+
+        Returns:
+            A generator of all matching resources.
+        """
+        query = cls.select_rows()
+        if filter_by:
+            query = query.filter_by(**filter_by)
+        query = query.order_by(order_by)\
+                     .execution_options(stream_results=True)\
+                     .yield_per(batch_size)
+        serialize = row_serializer(cls)
+        for row in query:
+            yield serialize(row)
+
+    @classmethod
+    @read_only
     def fetch_by_id(cls, resource_id: int) -> Optional[Dict[str, Any]]:
         """Fetches a resource by id.
 
@@ -128,11 +335,40 @@ class Model():
         Returns:
             The requested resource or None.
         """
-        response = cls.query.get(resource_id)
+        response = cls.select_rows().filter(cls.id == resource_id).first()
         if response:
-            return response.json()
+            return serialize_rows(cls, [response])[0]
 
     @classmethod
+    @read_only
+    def fetch_by_ids(
+        cls,
+        resource_ids: List[int]
+    ) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Fetches several resources by id in a single query.
+
+        Args:
+            resource_ids: The ids of the requested resources.
+
+        Returns:
+            The requested resources which exist, in the order requested, and
+            the ids of those which do not.
+        """
+        if not resource_ids:
+            return [], []
+        rows = cls.select_rows().filter(cls.id.in_(resource_ids)).all()
+        resources = {
+            resource['id']: resource for resource in serialize_rows(cls, rows)
+        }
+        missing = [resource_id
+                   for resource_id in dict.fromkeys(resource_ids)
+                   if resource_id not in resources]
+        return [resources[resource_id]
+                for resource_id in resource_ids
+                if resource_id in resources], missing
+
+    @classmethod
+    @read_only
     def fetch_first_filtered(
         cls,
         filter_by: object,
@@ -148,12 +384,15 @@ class Model():
         Returns:
             The requested resource or None.
         """
-        return cls.query.filter_by(**filter_by)\
-                        .order_by(order_by)\
-                        .first()\
-                        .json()
+        resource = cls.select_rows()\
+                      .filter_by(**filter_by)\
+                      .order_by(order_by)\
+                      .first()
+        if resource:
+            return serialize_rows(cls, [resource])[0]
 
     @classmethod
+    @read_only
     def fetch_page(
         cls,
         page: int,
@@ -161,16 +400,63 @@ class Model():
     ) -> Optional[List[Dict[str, Any]]]:
         """Fetches resources from the database sorted by id and paginated.
 
+        Unlike Flask-SQLAlchemy's paginate(), this runs no COUNT query; the
+        caller takes the total from a maintained counter instead.
+
         Args:
             page: The page number to fetch.
             per_page: The maximum number of results to show per page.
 
         Returns:
-            A list containing one page of resources.
+            A list containing one page of resources, or None if the page is
+            empty or out of range.
         """
-        resources = cls.query.order_by(cls.id).paginate(page, per_page)
+        if page < 1:
+            return None
+        resources = cls.select_rows()\
+                       .order_by(cls.id)\
+                       .offset((page - 1) * per_page)\
+                       .limit(per_page)\
+                       .all()
         if resources:
-            return [resource.json() for resource in resources.items]
+            return serialize_rows(cls, resources)
+
+    @classmethod
+    @read_only
+    def fetch_keyset(
+        cls,
+        after: int,
+        limit: int,
+        filter_by: Optional[object] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Fetches resources with ids greater than a cursor, sorted by id.
+
+        Unlike fetch_page, this seeks directly to the cursor through the
+        primary key index instead of skipping over OFFSET rows, so every page
+        costs the same regardless of its depth.
+
+        Args:
+            after: The id of the last resource of the previous page.
+            limit: The maximum number of resources to fetch.
+            filter_by: SQLAlchemy filtering criterion (see SQLAlchemy docs)
+
+        Returns:
+            A list containing one page of resources, and the cursor for the
+            next page or None if this is the last page.
+        """
+        query = cls.select_rows().filter(cls.id > after)
+        if filter_by:
+            query = query.filter_by(**filter_by)
+        # Fetch one extra row to learn whether another page follows
+        resources = serialize_rows(
+            cls,
+            query.order_by(cls.id).limit(limit + 1).all()
+        )
+        next_cursor = None
+        if len(resources) > limit:
+            resources = resources[:limit]
+            next_cursor = resources[-1]['id']
+        return resources, next_cursor
 
 #    @classmethod
 #    def get_required_fields(cls) -> List[str]:
@@ -199,4 +485,4 @@ class Model():
 #        return list(cls.__table__.primary_key.columns)[0].key
 
 
-db = SQLAlchemy(model_class=Model)
+db = RoutingSQLAlchemy(model_class=Model)
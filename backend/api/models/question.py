@@ -1,42 +1,150 @@
 """Defines the trivia Question model."""
-from typing import Any, Dict, List, Optional
+import re
+from typing import Any, Dict, List, Optional, Tuple
 
-from api.models.model import db, Model
+from sqlalchemy import DDL, event
+
+from api.models.category import Category
+from api.models.model import db, Model, read_only
+from api.models.serializer import serialize_rows
 
 
 class Question(Model):
     """This class represents a trivia Question."""
     __tablename__ = 'questions'
+    __table_args__ = (
+        # Serves per-category listings in id order, and quiz selection
+        db.Index('ix_questions_category_id', 'category', 'id'),
+        db.Index(
+            'ix_questions_question_trgm',
+            'question',
+            postgresql_using='gin',
+            postgresql_ops={'question': 'gin_trgm_ops'},
+        ),
+    )
 
     id = db.Column(db.Integer, autoincrement=True, primary_key=True)
     question = db.Column(db.String)
     answer = db.Column(db.String)
-    category = db.Column(db.String)
+    category = db.Column(db.Integer, db.ForeignKey(
+        Category.id,
+        name='category',
+        onupdate='CASCADE',
+        ondelete='SET NULL'
+    ))
     difficulty = db.Column(db.Integer)
 
     def __repr__(self):
         return f'<Question {self.id} {self.question}>'
 
     @classmethod
+    @read_only
+    def count_by_category(cls) -> Dict[Optional[int], int]:
+        """Fetches the number of stored questions in each category.
+
+        Returns:
+            A dict mapping each category id to its quantity of questions.
+        """
+        rows = db.session.query(cls.category, db.func.count(cls.id))\
+                         .group_by(cls.category)\
+                         .all()
+        return {category: count for category, count in rows}
+
+    @classmethod
+    @read_only
     def search(
             cls,
             search_term: str,
-            order_by: Optional[object] = None
-    ) -> Optional[List[Dict[str, Any]]]:
-        """Fetches all questions matching a search term from the database.
+            category: Optional[str] = None,
+            page: int = 1,
+            per_page: int = 10,
+            prefix: bool = False
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Fetches one page of questions matching a search term from the
+        database.
+
+        On PostgreSQL, the substring match is served by a trigram GIN index
+        and results are ranked by trigram similarity to the search term.
+        Elsewhere, results are ordered by id.
 
         Args:
             search_term: A term to search for (case-insensitive)
-            order_by: SQLAlchemy ORDER BY criterion (see SQLAlchemy docs)
+            category: The id of a category to restrict the search to.
+            page: The page number to fetch.
+            per_page: The maximum number of results to show per page.
+            prefix: Only match the term at the start of a word.
+
+        Returns:
+            A ranked list containing one page of questions matching the
+            search term, and the total number of matching questions.
+        """
+        pattern = re.sub(r'([/%_])', r'/\1', search_term)
+        if prefix:
+            query = cls.select_rows().filter(db.or_(
+                cls.question.ilike(f'{pattern}%', escape='/'),
+                cls.question.ilike(f'% {pattern}%', escape='/'),
+            ))
+        else:
+            query = cls.select_rows().filter(
+                cls.question.ilike(f'%{pattern}%', escape='/')
+            )
+        if category is not None:
+            query = query.filter(cls.category == int(category))
+
+        if db.engine.dialect.name == 'postgresql':
+            order_by = (db.func.similarity(cls.question, search_term).desc(),
+                        cls.id)
+        else:
+            order_by = (cls.id,)
+
+        total = query.count()
+        resources = query.order_by(*order_by)\
+                         .offset((page - 1) * per_page)\
+                         .limit(per_page)\
+                         .all()
+        return serialize_rows(cls, resources), total
+
+    @classmethod
+    def validate_all(cls, json: Dict[str, Any]) -> Dict[str, Any]:
+        """Validates all model attributes of this resource.
+
+        The category is only checked for presence; whether it exists is left
+        to the caller.
+
+        Args:
+            json: The attributes of a new question.
 
         Returns:
-            A ordered list of all questions matching the search term, or None.
+            The attributes, with the difficulty converted to an integer.
+
+        Raises:
+            ValueError: An attribute is missing, unknown or invalid.
         """
-        resources = cls.query.filter(cls.question.ilike(f'%{search_term}%')).order_by(order_by).all()
-        if resources:
-            return [resource.json() for resource in resources]
-
-#    @classmethod
-#    def validate_all(cls, json: Dict[str, Any]) -> None:
-#        """Validates all model attributes of this resource."""
-#        raise NotImplementedError
+        if not isinstance(json, dict):
+            raise ValueError('Question must be an object.')
+        unknown = set(json) - {'question', 'answer', 'category', 'difficulty'}
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}.')
+        for field in ('question', 'answer'):
+            value = json.get(field)
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError(f'Field "{field}" must be a non-empty string.')
+        try:
+            difficulty = int(json.get('difficulty'))
+        except (TypeError, ValueError):
+            difficulty = 0
+        if difficulty < 1:
+            raise ValueError('Field "difficulty" must be a positive integer.')
+        if json.get('category') in (None, ''):
+            raise ValueError('Field "category" is required.')
+        return {**json, 'difficulty': difficulty}
+
+
+# The trigram index requires the pg_trgm extension
+event.listen(
+    Question.__table__,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(
+        dialect='postgresql'
+    )
+)
@@ -0,0 +1,104 @@
+"""Numbers the revisions of each table, for validators shared by every
+process."""
+
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, text
+
+from api.models.model import WRITTEN_TABLES, Model, db, read_only
+from api.models.routing import RoutingSession
+
+
+class Revision(Model):
+    """The current revision of a table, and when it was last written.
+
+    A row is upserted in the same transaction as every write to a table
+    through the models, so the revision a database serves always matches the
+    rows it serves, on the primary and on each replica alike, and every
+    process serving the application reads the same revisions.
+    """
+    __tablename__ = 'revisions'
+
+    name = db.Column(db.String, primary_key=True)
+    revision = db.Column(db.BigInteger, nullable=False)
+    modified = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<Revision {self.name} {self.revision}>'
+
+    @classmethod
+    @read_only
+    def fetch_current(
+        cls,
+        names: Iterable[str]
+    ) -> Dict[str, Tuple[int, float]]:
+        """Fetches the revisions of several tables in a single query.
+
+        Args:
+            names: The names of the tables.
+
+        Returns:
+            The revision of each table and the time it was last written, as a
+            UNIX timestamp, for those tables which were ever written.
+        """
+        rows = db.session.query(cls.name, cls.revision, cls.modified)\
+                         .filter(cls.name.in_(list(names)))\
+                         .all()
+        return {name: (revision, modified)
+                for name, revision, modified in rows}
+
+    @classmethod
+    def bump(cls, session: RoutingSession, name: str,
+             now: Optional[float] = None) -> None:
+        """Starts a new revision of a table within the transaction of a
+        session.
+
+        The first revision of a table is numbered after the current time in
+        milliseconds, so revisions do not repeat if the table is recreated.
+
+        Args:
+            session: The session whose transaction wrote to the table.
+            name: The name of the table.
+            now: The time of the write, as a UNIX timestamp.
+        """
+        now = time.time() if now is None else now
+        session.execute(text(
+            f'INSERT INTO {cls.__tablename__} (name, revision, modified)'
+            ' VALUES (:name, :first, :now)'
+            ' ON CONFLICT (name) DO UPDATE SET'
+            f' revision = {cls.__tablename__}.revision + 1, modified = :now'
+        ), {'name': name, 'first': int(now * 1000), 'now': now})
+
+
+def _table_names(instances: Iterable[object]) -> Iterable[str]:
+    """Lists the tables of model instances."""
+    return {type(instance).__tablename__
+            for instance in instances
+            if isinstance(instance, Model)}
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _record_flushed_tables(session, flush_context, instances) -> None:
+    """Records the tables written by a flush of the session."""
+    written = _table_names([*session.new, *session.dirty, *session.deleted])
+    if written:
+        session.info.setdefault(WRITTEN_TABLES, set()).update(written)
+
+
+@event.listens_for(RoutingSession, 'before_commit')
+def _bump_written_tables(session) -> None:
+    """Bumps the revision of every table written by the transaction, before
+    it is committed."""
+    session.flush()
+    written = session.info.pop(WRITTEN_TABLES, set())
+    written.discard(Revision.__tablename__)
+    now = time.time()
+    for name in sorted(written):
+        Revision.bump(session, name, now)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_written_tables(session) -> None:
+    """Forgets the tables written by a transaction which was rolled back."""
+    session.info.pop(WRITTEN_TABLES, None)
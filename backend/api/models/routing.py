@@ -0,0 +1,149 @@
+"""Routes read-only queries to read replicas of the database."""
+
+import itertools
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+from flask import Flask, Response, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import orm
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.expression import UpdateBase
+
+
+# Prefix of the SQLALCHEMY_BINDS keys of the read replicas
+REPLICA_BIND_PREFIX = 'replica_'
+
+# Set on clients which have just written, so their reads see their writes
+PRIMARY_COOKIE = 'read_primary'
+
+# Sent by clients which need their reads to see their writes
+PRIMARY_HEADER = 'X-Read-Primary'
+
+
+def replica_binds(config: Mapping[str, Any]) -> Dict[str, str]:
+    """Builds the SQLALCHEMY_BINDS of an application, adding one bind for
+    each database URI of its DB_REPLICA_URLS setting.
+
+    Args:
+        config: The configuration of the application.
+    """
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    for position, uri in enumerate(config.get('DB_REPLICA_URLS') or ()):
+        binds[f'{REPLICA_BIND_PREFIX}{position}'] = uri
+    return binds
+
+
+class RoutingSession(SignallingSession):
+    """A session which sends read-only queries to a read replica.
+
+    Queries run inside RoutingSQLAlchemy.reading() go to the next replica in
+    turn, and every other statement goes to the primary database. Once a
+    session has written, it reads from the primary as well, so a request
+    always sees its own writes; use_primary forces this from the start.
+    """
+
+    def __init__(self, db: 'RoutingSQLAlchemy', autocommit: bool = False,
+                 autoflush: bool = True, **options: Any) -> None:
+        super().__init__(db, autocommit, autoflush, **options)
+        self.db = db
+        self.read_depth = 0
+        self.use_primary = False
+        self.wrote = False
+
+    def get_bind(self, mapper: Optional[Any] = None,
+                 clause: Optional[Any] = None) -> Engine:
+        """Returns the engine a statement should run on."""
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.wrote = True
+        elif self.read_depth and not (self.wrote or self.use_primary):
+            replica = self.db.next_replica(self.app)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """Binds sessions which route read-only queries to read replicas."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._turns = itertools.count()
+
+    def create_session(self, options: Dict[str, Any]) -> orm.sessionmaker:
+        """Creates the factory of RoutingSessions."""
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def replica_engines(self, app: Flask) -> List[Engine]:
+        """Fetches the engines of the read replicas of an application."""
+        binds = app.config.get('SQLALCHEMY_BINDS') or {}
+        return [self.get_engine(app, bind=key)
+                for key in sorted(binds)
+                if key.startswith(REPLICA_BIND_PREFIX)]
+
+    def next_replica(self, app: Flask) -> Optional[Engine]:
+        """Picks the read replica to run the next read-only query on, in
+        round-robin order, or None if there are no replicas."""
+        replicas = self.replica_engines(app)
+        if replicas:
+            return replicas[next(self._turns) % len(replicas)]
+
+    def dispose_engines(self, app: Flask) -> None:
+        """Closes the pooled connections of the primary and replica engines
+        of an application.
+
+        A forking server calls this before forking its workers, and again in
+        each worker, so that no two processes share a database connection:
+        each worker opens connections of its own on first use.
+        """
+        self.session.remove()
+        for engine in [self.get_engine(app), *self.replica_engines(app)]:
+            engine.dispose()
+
+    @contextmanager
+    def reading(self) -> Iterator[None]:
+        """Sends the queries of the current session to a read replica while
+        the context is open, unless the session has already written."""
+        session = self.session()
+        session.read_depth += 1
+        try:
+            yield
+        finally:
+            session.read_depth -= 1
+
+    @contextmanager
+    def primary(self) -> Iterator[None]:
+        """Sends every query of the current session to the primary database
+        while the context is open, even inside reading()."""
+        session = self.session()
+        use_primary = session.use_primary
+        session.use_primary = True
+        try:
+            yield
+        finally:
+            session.use_primary = use_primary
+
+    def init_read_routing(self, app: Flask) -> None:
+        """Pins read-your-writes requests to the primary database.
+
+        Clients which wrote within the last DB_REPLICA_LAG seconds carry the
+        read_primary cookie, and other clients may send the X-Read-Primary
+        header, so reads which must see earlier writes are not served by a
+        replica which has yet to receive them.
+        """
+        @app.before_request
+        def pin_to_primary() -> None:
+            if (request.cookies.get(PRIMARY_COOKIE) or
+                    request.headers.get(PRIMARY_HEADER)):
+                self.session().use_primary = True
+
+        @app.after_request
+        def mark_writers(response: Response) -> Response:
+            if self.session().wrote:
+                response.set_cookie(
+                    PRIMARY_COOKIE,
+                    '1',
+                    max_age=app.config['DB_REPLICA_LAG'],
+                    httponly=True
+                )
+            return response
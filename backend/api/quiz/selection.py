@@ -0,0 +1,75 @@
+"""Chooses the difficulty of the questions drawn for a quiz."""
+
+import random
+from typing import Dict, Mapping, NamedTuple, Optional
+
+
+# How the difficulty of each question is chosen, by 'strategy' parameter
+STRATEGIES = ('uniform', 'exact', 'near', 'ramp')
+
+
+class Selection(NamedTuple):
+    """The difficulty strategy of a quiz.
+
+    With 'exact', only questions of the given difficulty are drawn. With
+    'near', every question may be drawn, but each level of difficulty away
+    from the given one makes a question QUIZ_DIFFICULTY_FALLOFF times as
+    likely to be drawn. With 'ramp', questions are drawn as with 'near',
+    around a difficulty which starts at the given one (or the easiest) and
+    rises by one every QUIZ_RAMP_STEP questions asked.
+    """
+
+    strategy: str
+    difficulty: Optional[int] = None
+
+    def weights(
+        self,
+        levels: Mapping[int, int],
+        asked: int,
+        config: Mapping[str, object]
+    ) -> Dict[int, float]:
+        """Weighs each difficulty level for the next question.
+
+        Args:
+            levels: The number of unseen questions of each difficulty.
+            asked: The number of questions already asked in the quiz.
+            config: The configuration of the application.
+
+        Returns:
+            The relative likelihood of drawing each question of a level.
+        """
+        target = self.difficulty
+        if self.strategy == 'ramp':
+            start = target or min(levels, default=1)
+            target = min(start + asked // config['QUIZ_RAMP_STEP'],
+                         max(levels, default=start))
+        if self.strategy == 'exact':
+            return {target: 1.0}
+        falloff = config['QUIZ_DIFFICULTY_FALLOFF']
+        return {level: falloff ** abs(level - target) for level in levels}
+
+
+def choose_level(
+    weights: Mapping[int, float],
+    levels: Mapping[int, int]
+) -> Optional[int]:
+    """Picks the difficulty of the next question, with a probability
+    proportional to the total weight of its unseen questions, so that each
+    question is drawn in proportion to its own weight.
+
+    Args:
+        weights: The weight of each question of a level.
+        levels: The number of unseen questions of each level.
+
+    Returns:
+        The level to draw from, or None if no unseen question has weight.
+    """
+    masses = [(level, weights.get(level, 0.0) * count)
+              for level, count in levels.items()
+              if count > 0 and weights.get(level, 0.0) > 0]
+    point = random.random() * sum(mass for _, mass in masses)
+    for level, mass in masses:
+        point -= mass
+        if point < 0:
+            return level
+    return masses[-1][0] if masses else None
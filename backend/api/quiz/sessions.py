@@ -0,0 +1,172 @@
+"""Stores the state of server-side quiz sessions."""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from api.quiz.selection import Selection
+
+
+class QuizSession():
+    """A quiz in progress: its category, its difficulty strategy and the ids
+    of the questions already asked.
+
+    No deck of the category's questions is kept: each question is drawn
+    from the category as it is asked, leaving out those already asked, so a
+    session holds only the ids it has asked, however large the category.
+    """
+
+    def __init__(
+        self,
+        category: Optional[int] = None,
+        selection: Optional[Selection] = None,
+        asked: Optional[List[int]] = None
+    ) -> None:
+        self.category = category
+        self.selection = selection
+        self.asked = asked or []
+
+    @property
+    def size(self) -> int:
+        """The number of question ids held by the session."""
+        return len(self.asked)
+
+
+class QuizSessionStore():
+    """This is the base class for stores of quiz sessions.
+
+    A store keeps each session for QUIZ_SESSION_TTL seconds after it was last
+    used. Stores shared between processes, such as one backed by Redis,
+    subclass this and register themselves with register_store(), so a quiz
+    may be continued by any worker.
+
+    Args:
+        ttl: The seconds a session is kept after it was last used.
+        limit: The most sessions kept.
+        max_ids: The most question ids kept across every session, or None
+            for no limit.
+    """
+
+    def __init__(self, ttl: int, limit: int,
+                 max_ids: Optional[int] = None) -> None:
+        self.ttl = ttl
+        self.limit = limit
+        self.max_ids = max_ids
+
+    def create(self, session: QuizSession) -> str:
+        """Stores a new session.
+
+        Returns:
+            The id of the session.
+        """
+        quiz_id = secrets.token_urlsafe(16)
+        self.put(quiz_id, session)
+        return quiz_id
+
+    def get(self, quiz_id: str) -> Optional[QuizSession]:
+        """Fetches a session, or None if it does not exist or has expired."""
+        raise NotImplementedError
+
+    def put(self, quiz_id: str, session: QuizSession) -> None:
+        """Saves a session, restarting its time to live."""
+        raise NotImplementedError
+
+    def delete(self, quiz_id: str) -> None:
+        """Removes a session, if present."""
+        raise NotImplementedError
+
+
+class MemoryQuizSessionStore(QuizSessionStore):
+    """Keeps quiz sessions in the memory of the current process.
+
+    Sessions are kept in order of last use, so expired sessions are evicted
+    from the front of the order, and the least recently used sessions are
+    evicted once the store holds QUIZ_SESSION_LIMIT sessions, or
+    QUIZ_SESSION_MAX_IDS question ids across its sessions, which bounds its
+    memory whatever the size of the quizzes.
+    """
+
+    def __init__(self, ttl: int, limit: int,
+                 max_ids: Optional[int] = None) -> None:
+        super().__init__(ttl, limit, max_ids)
+        self._lock = threading.Lock()
+        self._sessions: 'OrderedDict[str, Tuple[float, int, QuizSession]]' = \
+            OrderedDict()
+        self._ids = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def ids(self) -> int:
+        """The number of question ids held across every session, as of
+        when each was last saved."""
+        return self._ids
+
+    def _over_limits(self) -> bool:
+        """Whether the store holds too many sessions or question ids."""
+        return (len(self._sessions) > self.limit or
+                (self.max_ids is not None and self._ids > self.max_ids))
+
+    def _remove(self, quiz_id: str) -> None:
+        """Removes a session, uncounting its question ids."""
+        entry = self._sessions.pop(quiz_id, None)
+        if entry is not None:
+            self._ids -= entry[1]
+
+    def _evict(self, now: float) -> None:
+        """Removes expired sessions, then any beyond the limits."""
+        while self._sessions:
+            quiz_id, (expires_at, _, _) = next(iter(self._sessions.items()))
+            if expires_at > now and not self._over_limits():
+                break
+            self._remove(quiz_id)
+
+    def get(self, quiz_id: str) -> Optional[QuizSession]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._sessions.get(quiz_id)
+            if entry is not None:
+                return entry[2]
+
+    def put(self, quiz_id: str, session: QuizSession) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._remove(quiz_id)
+            self._sessions[quiz_id] = (now + self.ttl, session.size, session)
+            self._ids += session.size
+            self._evict(now)
+
+    def delete(self, quiz_id: str) -> None:
+        with self._lock:
+            self._remove(quiz_id)
+
+
+# Quiz session store classes, by QUIZ_SESSION_STORE setting
+_stores: Dict[str, type] = {'memory': MemoryQuizSessionStore}
+
+
+def register_store(name: str, store: type) -> None:
+    """Makes a QuizSessionStore subclass selectable by the
+    QUIZ_SESSION_STORE setting."""
+    _stores[name] = store
+
+
+def quiz_sessions() -> QuizSessionStore:
+    """Fetches the quiz session store of the current application, creating
+    it on first use."""
+    store = current_app.extensions.get('quiz_sessions')
+    if store is None:
+        config = current_app.config
+        store = _stores[config['QUIZ_SESSION_STORE']](
+            config['QUIZ_SESSION_TTL'],
+            config['QUIZ_SESSION_LIMIT'],
+            max_ids=config['QUIZ_SESSION_MAX_IDS']
+        )
+        store = current_app.extensions.setdefault('quiz_sessions', store)
+    return store
@@ -1,54 +1,116 @@
 """API interface for trivia question Categories."""
 
-from flask import Response, abort, current_app, jsonify
+from itertools import chain
 
+from flask import Blueprint, Response, abort, request
+
+from api.cache.categories import category_cache
+from api.cache.question_counts import question_counts
+from api.cache.responses import response_cache
 from api.models.category import Category
 from api.models.question import Question
+from api.resources.pagination import Cursor, parse_cursor
+from api.resources.responses import json_response, stream_json_response
 
 
 class CategoryAPI():
     """API interface for Categories of trivia questions."""
 
     @staticmethod
+    @response_cache.cached(Category)
     def get() -> Response:
-        """Fetches a list of all categories."""
-        categories = Category.fetch_all(Category.id)
+        """Fetches a list of all categories.
+
+        The response carries a strong ETag, and a request whose
+        If-None-Match header matches it is answered with 304 Not Modified.
+        """
+        categories = category_cache.all()
         if not categories:
             abort(404)
-        return jsonify({
+        response = json_response({
             'success': True,
-            'categories': categories
+            'categories': category_cache.fragment,
         })
+        response.set_etag(category_cache.etag)
+        return response.make_conditional(request)
 
     @staticmethod
+    @response_cache.conditional(Question, Category)
+    @response_cache.cached(Question, Category)
     def get_questions(category_id: int) -> Response:
         """Fetches a list of all questions in a specified category.
 
+        The questions are read from the database and encoded in batches
+        while the response is sent.
+
+        Passing '?after=<id>' switches to keyset pagination, which returns at
+        most 'limit' questions following that id and a 'next_cursor'. The
+        total count is only included when '&count=true' is passed.
+
         Args:
             category_id: The id of the category from which to fetch questions.
         """
-        questions = Question.fetch_all_filtered({'category': category_id})
+        cursor = parse_cursor()
+        if cursor:
+            return CategoryAPI._get_questions_after(category_id, cursor)
+
+        questions = Question.fetch_stream(
+            {'category': category_id},
+            Question.id
+        )
+        first = next(questions, None)
+        if first is None:
+            abort(404)
+
+        return stream_json_response(
+            {
+                'success': True,
+                'total_questions': question_counts.total(),
+                'current_category': category_cache.by_id(category_id),
+            },
+            'questions',
+            chain([first], questions)
+        )
+
+    @staticmethod
+    def _get_questions_after(category_id: int, cursor: Cursor) -> Response:
+        """Fetches the page of a category's questions following a cursor.
+
+        Args:
+            category_id: The id of the category from which to fetch questions.
+            cursor: The keyset pagination arguments of the request.
+        """
+        questions, next_cursor = Question.fetch_keyset(
+            cursor.after,
+            cursor.limit,
+            {'category': category_id}
+        )
         if not questions:
             abort(404)
 
-        return jsonify({
+        response = {
             'success': True,
             'questions': questions,
-            'total_questions': Question.count_all(),
-            'current_category': Category.fetch_by_id(category_id),
-        })
+            'next_cursor': next_cursor,
+            'current_category': category_cache.by_id(category_id),
+        }
+        if cursor.count:
+            response['total_questions'] = question_counts.total()
+        return json_response(response)
 
 
-current_app.add_url_rule(
-    rule='/categories',
-    endpoint='categories',
-    view_func=CategoryAPI.get,
-    methods=['GET']
-)
+def register(blueprint: Blueprint) -> None:
+    """Adds the category routes to a blueprint."""
+    blueprint.add_url_rule(
+        rule='/categories',
+        endpoint='categories',
+        view_func=CategoryAPI.get,
+        methods=['GET']
+    )
 
-current_app.add_url_rule(
-    rule='/categories/<int:category_id>/questions',
-    endpoint='questions_by_category',
-    view_func=CategoryAPI.get_questions,
-    methods=['GET']
-)
+    blueprint.add_url_rule(
+        rule='/categories/<int:category_id>/questions',
+        endpoint='questions_by_category',
+        view_func=CategoryAPI.get_questions,
+        methods=['GET']
+    )
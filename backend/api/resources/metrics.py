@@ -0,0 +1,79 @@
+"""API interface for operational metrics of the application."""
+
+from flask import Blueprint, Response, current_app
+
+from api.cache.responses import response_cache
+from api.instrumentation import instrumentation
+from api.models.engine import pool_metrics
+from api.models.model import db
+from api.resources.responses import json_response
+
+
+class MetricsAPI():
+    """API interface for operational metrics."""
+
+    @staticmethod
+    def get_all() -> Response:
+        """Reports the request, query, pool and cache metrics of this process
+        in the Prometheus text exposition format."""
+        pool = pool_metrics(current_app, db.engine).snapshot()
+        cache = response_cache.stats()
+        gauges = [
+            ('trivia_db_connections_checked_out',
+             'Connections checked out of the pool.', pool['checked_out']),
+            ('trivia_db_connections_max_checked_out',
+             'Most connections checked out of the pool at once.',
+             pool['max_checked_out']),
+            ('trivia_response_cache_entries',
+             'Responses held by the response cache.', cache['entries']),
+        ]
+        counters = [
+            ('trivia_response_cache_hits_total', 'Response cache hits.',
+             cache['hits']),
+            ('trivia_response_cache_misses_total', 'Response cache misses.',
+             cache['misses']),
+        ]
+        return current_app.response_class(
+            instrumentation.render(gauges, counters),
+            mimetype='text/plain; version=0.0.4'
+        )
+
+    @staticmethod
+    def get_cache() -> Response:
+        """Reports the hits and misses of this process's response cache."""
+        return json_response({
+            'success': True,
+            'cache': response_cache.stats(),
+        })
+
+    @staticmethod
+    def get_pool() -> Response:
+        """Reports the state of this process's database connection pool."""
+        return json_response({
+            'success': True,
+            'pool': pool_metrics(current_app, db.engine).snapshot(),
+        })
+
+
+def register(blueprint: Blueprint) -> None:
+    """Adds the metrics routes to a blueprint."""
+    blueprint.add_url_rule(
+        rule='/metrics',
+        endpoint='metrics',
+        view_func=MetricsAPI.get_all,
+        methods=['GET']
+    )
+
+    blueprint.add_url_rule(
+        rule='/metrics/cache',
+        endpoint='cache_metrics',
+        view_func=MetricsAPI.get_cache,
+        methods=['GET']
+    )
+
+    blueprint.add_url_rule(
+        rule='/metrics/pool',
+        endpoint='pool_metrics',
+        view_func=MetricsAPI.get_pool,
+        methods=['GET']
+    )
@@ -0,0 +1,36 @@
+"""Request argument parsing shared by paginated resources."""
+
+from typing import NamedTuple, Optional
+
+from flask import abort, request
+
+from config import Config
+
+
+class Cursor(NamedTuple):
+    """Keyset pagination arguments of a request."""
+    after: int
+    limit: int
+    count: bool
+
+
+def parse_cursor() -> Optional[Cursor]:
+    """Parses the '?after=<id>&limit=N&count=true' request arguments.
+
+    Returns:
+        The cursor arguments, or None if the request did not ask for keyset
+        pagination (no 'after' argument).
+    """
+    if 'after' not in request.args:
+        return None
+
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', Config.PAGE_LENGTH, type=int)
+    if after is None or after < 0 or limit is None or limit < 1:
+        abort(400)
+
+    return Cursor(
+        after=after,
+        limit=min(limit, Config.MAX_PAGE_LENGTH),
+        count=request.args.get('count', '').lower() in ('1', 'true', 'yes'),
+    )
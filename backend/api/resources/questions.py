@@ -1,13 +1,41 @@
 """API interface for trivia Questions."""
-from flask import Response, abort, current_app, jsonify, request
+from typing import Any, List
 
+from flask import Blueprint, Response, abort, request
+
+from api.bulk import (RowError, import_questions, parse_ndjson,
+                      validate_question)
+from api.cache.categories import category_cache
+from api.cache.question_counts import question_counts
+from api.cache.responses import response_cache
 from api.models.category import Category
 from api.models.question import Question
+from api.resources.pagination import Cursor, parse_cursor
+from api.resources.responses import json_response, stream_ndjson_response
+from api.search.engine import search_questions
 from config import Config
 
 class QuestionAPI():
     """API interface for trivia Questions."""
 
+    @staticmethod
+    def _parse_ids(ids: Any) -> List[int]:
+        """Validates a list of question ids from a request.
+
+        Args:
+            ids: A list of ids, or a string of comma-separated ids.
+        """
+        if isinstance(ids, str):
+            ids = ids.split(',')
+        if not isinstance(ids, list) or not ids:
+            abort(400)
+        if len(ids) > Config.MAX_BATCH_IDS:
+            abort(422)
+        try:
+            return [int(question_id) for question_id in ids]
+        except (TypeError, ValueError):
+            abort(400)
+
     @staticmethod
     def delete(question_id: int) -> Response:
         """Deletes a question.
@@ -18,12 +46,47 @@ class QuestionAPI():
         if not Question.delete_by_id(question_id):
             abort(404)
 
-        return jsonify({
+        return json_response({
             'success': True,
-            'totalQuestions': Question.count_all(),
+            'totalQuestions': question_counts.total(),
         })
 
     @staticmethod
+    def delete_many() -> Response:
+        """Deletes several questions in one statement.
+
+        The ids of the questions are passed as an 'ids' list in the request
+        body. Ids of questions which do not exist are reported as missing."""
+        question_ids = QuestionAPI._parse_ids(
+            (request.get_json(silent=True) or {}).get('ids')
+        )
+        deleted, missing = Question.delete_by_ids(question_ids)
+        if not deleted:
+            abort(404)
+
+        return json_response({
+            'success': True,
+            'deleted': [question['id'] for question in deleted],
+            'missing': missing,
+            'totalQuestions': question_counts.total(),
+        })
+
+    @staticmethod
+    def export() -> Response:
+        """Exports every question as newline-delimited JSON, ordered by id.
+
+        Questions are read through a server-side cursor and encoded while the
+        response is sent, so memory use does not grow with the number of
+        questions. The response is gzipped for clients accepting gzip."""
+        questions = Question.fetch_stream(order_by=Question.id)
+        return stream_ndjson_response(
+            questions,
+            compress=request.accept_encodings['gzip'] > 0
+        )
+
+    @staticmethod
+    @response_cache.conditional(Question, Category)
+    @response_cache.cached(Question, Category)
     def get_one(question_id: int) -> Response:
         """Fetches one question from the database.
 
@@ -34,91 +97,229 @@ class QuestionAPI():
         if not question:
             abort(404)
 
-        return jsonify({
+        return json_response({
             'success': True,
             'questions': [question],
-            'totalQuestions': Question.count_all(),
-            'categories': Category.fetch_all(order_by=Category.id),
+            'totalQuestions': question_counts.total(),
+            'categories': category_cache.fragment,
             'currentCategory': question.get('category'),
         })
 
     @staticmethod
+    @response_cache.conditional(Question, Category)
+    @response_cache.cached(Question, Category)
     def get_page() -> Response:
         """Fetches one page of questions from the database.
         If no specific page is requested, default to page 1.
-        Page numbers are passed as request arguments."""
+        Page numbers are passed as request arguments.
+
+        Passing '?after=<id>' instead switches to keyset pagination, which
+        returns the questions following that id and a 'nextCursor'. The total
+        count is only included when '&count=true' is passed.
+
+        Passing '?ids=<id>,<id>,...' instead fetches those questions in one
+        query, reporting the ids of any which do not exist as 'missing'."""
+        if 'ids' in request.args:
+            return QuestionAPI._get_many(request.args['ids'])
+
+        cursor = parse_cursor()
+        if cursor:
+            return QuestionAPI._get_page_after(cursor)
+
         page = int(request.args.get('page', 1))
         questions = Question.fetch_page(page, Config.PAGE_LENGTH)
         if not questions:
             abort(404)
 
-        return jsonify({
+        return json_response({
+            'success': True,
+            'questions': questions,
+            'totalQuestions': question_counts.total(),
+            'categories': category_cache.fragment,
+            'currentCategory': None,
+        })
+
+    @staticmethod
+    def _get_many(ids: str) -> Response:
+        """Fetches several questions by id.
+
+        Args:
+            ids: The comma-separated ids of the requested questions.
+        """
+        questions, missing = Question.fetch_by_ids(QuestionAPI._parse_ids(ids))
+        if not questions:
+            abort(404)
+
+        return json_response({
             'success': True,
             'questions': questions,
-            'totalQuestions': Question.count_all(),
-            'categories': Category.fetch_all(order_by=Category.id),
+            'missing': missing,
+            'totalQuestions': question_counts.total(),
+            'categories': category_cache.fragment,
             'currentCategory': None,
         })
 
+    @staticmethod
+    def _get_page_after(cursor: Cursor) -> Response:
+        """Fetches the page of questions following a keyset cursor.
+
+        Args:
+            cursor: The keyset pagination arguments of the request.
+        """
+        questions, next_cursor = Question.fetch_keyset(
+            cursor.after,
+            cursor.limit
+        )
+        if not questions:
+            abort(404)
+
+        response = {
+            'success': True,
+            'questions': questions,
+            'nextCursor': next_cursor,
+            'categories': category_cache.fragment,
+            'currentCategory': None,
+        }
+        if cursor.count:
+            response['totalQuestions'] = question_counts.total()
+        return json_response(response)
+
     @staticmethod
     def post_new() -> Response:
-        """Adds a new question to the game."""
-        question = Question(**request.get_json())
-        if (not question.question or
-            not question.answer or
-            not question.difficulty or
-            not Category.fetch_by_id(question.category)):
-            abort(400)
+        """Adds a new question to the game.
+
+        The category may be given by its id or by its type. The question is
+        validated as each question of a bulk import is, and an invalid one
+        is rejected with the same errors, as row 1."""
+        try:
+            attributes = validate_question(request.get_json(silent=True))
+        except ValueError as error:
+            return json_response({
+                'success': False,
+                'error': 400,
+                'message': 'Request not understood.',
+                'errors': [RowError(1, str(error))._asdict()],
+            }, 400)
+        question = Question(**attributes)
         question.insert()
-        return jsonify({
+        return json_response({
             'success': True,
             'questions': [question.json()],
-            'totalQuestions': Question.count_all(),
+            'totalQuestions': question_counts.total(),
+        })
+
+    @staticmethod
+    def post_bulk() -> Response:
+        """Adds many new questions to the game.
+
+        The body is either a JSON array of questions or, with the
+        'application/x-ndjson' content type, one question per line, which is
+        read as it arrives. Valid questions are inserted in batches, while
+        invalid ones are skipped and reported by their position."""
+        if request.mimetype == 'application/x-ndjson':
+            records = parse_ndjson(request.stream)
+        else:
+            records = request.get_json()
+            if not isinstance(records, list):
+                abort(400)
+
+        result = import_questions(records, Config.IMPORT_BATCH_SIZE)
+        return json_response({
+            'success': True,
+            'inserted': result.inserted,
+            'failed': len(result.errors),
+            'errors': [error._asdict() for error in result.errors],
+            'totalQuestions': question_counts.total(),
         })
 
     @staticmethod
     def search() -> Response:
-        """Searches for a specific question."""
-        results = Question.search(request.get_json()['search_term'])
-        return jsonify({
+        """Searches for a specific question.
+
+        Results are ranked and paginated. The request body may pass a 'page'
+        number (default 1), a 'category' id to restrict the search to, and
+        'prefix': true to only match the term at the start of a word."""
+        request_json = request.get_json() or {}
+        search_term = request_json.get('search_term')
+        category = request_json.get('category')
+        try:
+            page = int(request_json.get('page', 1))
+            if category is not None:
+                category = int(category)
+        except (TypeError, ValueError):
+            abort(400)
+        if not isinstance(search_term, str) or page < 1:
+            abort(400)
+
+        results, total = search_questions(
+            search_term,
+            category,
+            page,
+            Config.PAGE_LENGTH,
+            bool(request_json.get('prefix'))
+        )
+        return json_response({
             'success': True,
             'questions': results,
-            'total_questions': len(results),
-            'current_category': None,
+            'total_questions': total,
+            'current_category': category,
         })
 
 
-current_app.add_url_rule(
-    rule='/questions/<int:question_id>',
-    endpoint='delete_question',
-    view_func=QuestionAPI.delete,
-    methods=['DELETE']
-)
-
-current_app.add_url_rule(
-    rule='/questions',
-    endpoint='get_page_of_questions',
-    view_func=QuestionAPI.get_page,
-    methods=['GET']
-)
-
-current_app.add_url_rule(
-    rule='/questions/<int:question_id>',
-    endpoint='get_one_question',
-    view_func=QuestionAPI.get_one,
-    methods=['GET']
-)
-
-current_app.add_url_rule(
-    rule='/questions',
-    endpoint='post_new_question',
-    view_func=QuestionAPI.post_new,
-    methods=['POST']
-)
-
-current_app.add_url_rule(
-    rule='/questions/search',
-    endpoint='search_questions',
-    view_func=QuestionAPI.search,
-    methods=['POST']
-)
+def register(blueprint: Blueprint) -> None:
+    """Adds the question routes to a blueprint."""
+    blueprint.add_url_rule(
+        rule='/questions/<int:question_id>',
+        endpoint='delete_question',
+        view_func=QuestionAPI.delete,
+        methods=['DELETE']
+    )
+
+    blueprint.add_url_rule(
+        rule='/questions',
+        endpoint='delete_many_questions',
+        view_func=QuestionAPI.delete_many,
+        methods=['DELETE']
+    )
+
+    blueprint.add_url_rule(
+        rule='/questions',
+        endpoint='get_page_of_questions',
+        view_func=QuestionAPI.get_page,
+        methods=['GET']
+    )
+
+    blueprint.add_url_rule(
+        rule='/questions/export',
+        endpoint='export_questions',
+        view_func=QuestionAPI.export,
+        methods=['GET']
+    )
+
+    blueprint.add_url_rule(
+        rule='/questions/<int:question_id>',
+        endpoint='get_one_question',
+        view_func=QuestionAPI.get_one,
+        methods=['GET']
+    )
+
+    blueprint.add_url_rule(
+        rule='/questions',
+        endpoint='post_new_question',
+        view_func=QuestionAPI.post_new,
+        methods=['POST']
+    )
+
+    blueprint.add_url_rule(
+        rule='/questions/bulk',
+        endpoint='post_many_questions',
+        view_func=QuestionAPI.post_bulk,
+        methods=['POST']
+    )
+
+    blueprint.add_url_rule(
+        rule='/questions/search',
+        endpoint='search_questions',
+        view_func=QuestionAPI.search,
+        methods=['POST']
+    )
@@ -1,10 +1,14 @@
 """API interface for trivia quizzes."""
-import random
+from typing import Any, Dict, List, Optional
 
-from flask import Response, current_app, jsonify, request
+from flask import Blueprint, Response, abort, current_app, request
 
-from api.models.category import Category
+from api.cache.categories import category_cache
+from api.cache.question_index import question_index
 from api.models.question import Question
+from api.quiz.selection import STRATEGIES, Selection
+from api.quiz.sessions import QuizSession, quiz_sessions
+from api.resources.responses import json_response
 
 
 class QuizAPI():
@@ -12,45 +16,202 @@ class QuizAPI():
 
     @staticmethod
     def dispatch_question() -> Response:
-        """Dispatches new questions to an active game."""
+        """Dispatches new questions to an active game.
+
+        A game is either stateless, with the client sending its category and
+        every previously asked question on each request, or kept on the
+        server: a request with 'session' set starts a quiz and returns its
+        'quiz_id', and later requests need only send that id. Either way, a
+        request with a 'count' receives that many questions at once.
+
+        Questions are drawn uniformly at random, unless a 'strategy' or a
+        'difficulty' is passed (see api.quiz.selection.Selection): 'exact'
+        only draws questions of the difficulty, 'near' (the default when a
+        difficulty is passed) prefers questions close to it, and 'ramp'
+        raises the difficulty as the quiz goes on, starting from the
+        difficulty if one is passed.
+        """
+        request_json = request.get_json() or {}
+        count = QuizAPI._parse_count(request_json)
+        if request_json.get('quiz_id') is not None:
+            return QuizAPI._continue_session(request_json['quiz_id'], count)
+
+        selection = QuizAPI._parse_selection(request_json)
+        category_id = QuizAPI._resolve_category(request_json)
+        previous_questions = QuizAPI._parse_previous_questions(request_json)
+        if request_json.get('session'):
+            return QuizAPI._start_session(category_id, previous_questions,
+                                          count, selection)
+
+        questions = QuizAPI._draw_questions(category_id,
+                                            list(previous_questions),
+                                            count or 1, selection)
+        return QuizAPI._respond({'success': True}, questions, count)
+
+    @staticmethod
+    def _parse_count(request_json: Dict[str, Any]) -> Optional[int]:
+        """Parses the number of questions requested at once, or None for a
+        single question."""
+        count = request_json.get('count', request_json.get('batch'))
+        if count is None:
+            return None
+        if (isinstance(count, bool) or not isinstance(count, int) or
+                not 1 <= count <= current_app.config['QUIZ_BATCH_LIMIT']):
+            abort(400)
+        return count
+
+    @staticmethod
+    def _parse_previous_questions(request_json: Dict[str, Any]) -> List[int]:
+        """Parses the ids of the questions already asked, which may be
+        missing or null for none."""
+        previous_questions = request_json.get('previous_questions')
+        if previous_questions is None:
+            return []
+        if not isinstance(previous_questions, list) or any(
+                isinstance(question_id, bool) or
+                not isinstance(question_id, int)
+                for question_id in previous_questions):
+            abort(400)
+        return previous_questions
+
+    @staticmethod
+    def _parse_selection(request_json: Dict[str, Any]) -> Optional[Selection]:
+        """Parses the difficulty strategy of a quiz, or None to draw
+        questions uniformly."""
+        difficulty = request_json.get('difficulty')
+        strategy = request_json.get('strategy')
+        if strategy is None:
+            strategy = 'uniform' if difficulty is None else 'near'
+        if strategy not in STRATEGIES:
+            abort(400)
+        if difficulty is not None and (
+                isinstance(difficulty, bool) or
+                not isinstance(difficulty, int) or difficulty < 1):
+            abort(400)
+        if strategy in ('exact', 'near') and difficulty is None:
+            abort(400)
+        if strategy == 'uniform':
+            return None
+        return Selection(strategy, difficulty)
+
+    @staticmethod
+    def _draw(
+        category_id: Optional[int],
+        exclude: List[int],
+        count: int,
+        selection: Optional[Selection]
+    ) -> List[int]:
+        """Draws the ids of up to count questions of a category which are
+        not excluded, with the likelihood of each set by the selection."""
+        if selection is None:
+            return question_index.random_unseen_many(category_id, exclude,
+                                                     count)
+        config = current_app.config
+        return question_index.random_unseen_weighted(
+            category_id,
+            exclude,
+            count,
+            lambda levels, drawn: selection.weights(
+                levels, len(exclude) + drawn, config
+            )
+        )
+
+    @staticmethod
+    def _draw_questions(
+        category_id: Optional[int],
+        asked: List[int],
+        count: int,
+        selection: Optional[Selection]
+    ) -> List[Dict[str, Any]]:
+        """Fetches up to count random questions of a category which have not
+        been asked, adding the ids drawn to the asked list.
+
+        Ids which have since been deleted by another process are dropped
+        from the index and others are drawn in their place.
+        """
+        questions: List[Dict[str, Any]] = []
+        while len(questions) < count:
+            drawn = QuizAPI._draw(category_id, asked,
+                                  count - len(questions), selection)
+            if not drawn:
+                break
+            asked.extend(drawn)
+            found, missing = Question.fetch_by_ids(drawn)
+            for question_id in missing:
+                question_index.discard(question_id)
+            questions.extend(found)
+        return questions
+
+    @staticmethod
+    def _respond(
+        payload: Dict[str, Any],
+        questions: List[Dict[str, Any]],
+        count: Optional[int]
+    ) -> Response:
+        """Sends the questions drawn, as a list if a count was requested, or
+        else as the single next question, or None once every question has
+        been asked."""
+        if count is None:
+            payload['question'] = questions[0] if questions else None
+        else:
+            payload['questions'] = questions
+        return json_response(payload)
+
+    @staticmethod
+    def _resolve_category(request_json: Dict[str, Any]) -> Optional[int]:
+        """Resolves the user-selected category id, or None for ALL."""
         # NOTE: The front-end is buggy and doesn't pass the correct category id,
         # so we must lookup the category by 'type' instead. The 'type' passed
         # from the front-end for ALL is 'click', otherwise it is the name of the
         # category ('science', 'art', etc...)
-        request_json = request.get_json()
-
-        # Fetch all questions from the user-selected category
         category = request_json.get('quiz_category')
+        if not isinstance(category, dict):
+            abort(400)
         if category.get('type') == 'click':
-            questions = Question.fetch_all()
+            return None
+        if category.get('type') is not None:
+            resolved = category_cache.by_type(category['type'])
         else:
-            category = Category.fetch_first_filtered({
-                'type': category.get('type')
-            })
-            questions = Question.fetch_all_filtered({
-                'category': category.get('id')
-            })
-
-        # Enumerate the set of questions which have not previously been asked
-        previous_questions = set(request_json.get('previous_questions'))
-        all_questions = set([question['id'] for question in questions])
-        available_questions = all_questions - previous_questions
-
-        # Select a random question from those available, or None
-        if available_questions:
-            question = random.choice(tuple(available_questions))
-        else:
-            question = None
+            resolved = category_cache.by_id(category.get('id'))
+        if resolved is None:
+            abort(422)
+        return resolved['id']
+
+    @staticmethod
+    def _start_session(
+        category_id: Optional[int],
+        previous_questions: List[int],
+        count: Optional[int],
+        selection: Optional[Selection] = None
+    ) -> Response:
+        """Starts a server-side quiz of a category, with its difficulty
+        strategy, and dispatches its first questions."""
+        store = quiz_sessions()
+        session = QuizSession(category_id, selection, list(previous_questions))
+        quiz_id = store.create(session)
+        return QuizAPI._continue_session(quiz_id, count)
+
+    @staticmethod
+    def _continue_session(quiz_id: str, count: Optional[int]) -> Response:
+        """Dispatches the next questions of a server-side quiz."""
+        store = quiz_sessions()
+        session = store.get(quiz_id)
+        if session is None:
+            abort(404)
+
+        questions = QuizAPI._draw_questions(session.category, session.asked,
+                                            count or 1, session.selection)
+        store.put(quiz_id, session)
 
-        return jsonify({
-            'success': True,
-            'question': question and Question.fetch_by_id(question),
-        })
+        return QuizAPI._respond({'success': True, 'quiz_id': quiz_id},
+                                questions, count)
 
 
-current_app.add_url_rule(
-    rule='/quizzes',
-    endpoint='quiz',
-    view_func=QuizAPI.dispatch_question,
-    methods=['POST']
-)
+def register(blueprint: Blueprint) -> None:
+    """Adds the quiz routes to a blueprint."""
+    blueprint.add_url_rule(
+        rule='/quizzes',
+        endpoint='quiz',
+        view_func=QuizAPI.dispatch_question,
+        methods=['POST']
+    )
@@ -0,0 +1,143 @@
+"""JSON responses shared by all resources."""
+
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List
+
+from flask import Response, current_app, stream_with_context
+
+from api.encoder import dumps, encode
+from api.instrumentation import instrumentation
+
+
+def json_response(payload: Dict[str, Any], status: int = 200) -> Response:
+    """Builds a JSON response, as jsonify does, with a faster encoder.
+
+    Values of the payload which are api.encoder.Fragment instances are
+    spliced into the response without being encoded again.
+
+    Args:
+        payload: The top-level keys and values of the response.
+        status: The HTTP status code of the response.
+    """
+    with instrumentation.serializing():
+        body = b','.join(dumps(key) + b':' + encode(payload[key])
+                         for key in sorted(payload))
+    return current_app.response_class(
+        b'{' + body + b'}',
+        status=status,
+        mimetype='application/json'
+    )
+
+
+def _encode_array(
+    items: Iterable[Dict[str, Any]],
+    batch_size: int
+) -> Iterator[bytes]:
+    """Encodes an iterable as a JSON array, one batch of items at a time."""
+    yield b'['
+    batch = []
+    separator = b''
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            with instrumentation.serializing():
+                chunk = separator + dumps(batch)[1:-1]
+            yield chunk
+            batch = []
+            separator = b','
+    if batch:
+        with instrumentation.serializing():
+            chunk = separator + dumps(batch)[1:-1]
+        yield chunk
+    yield b']'
+
+
+def stream_json_response(
+    payload: Dict[str, Any],
+    stream_key: str,
+    items: Iterable[Dict[str, Any]],
+    batch_size: int = 100
+) -> Response:
+    """Builds a JSON response whose largest array is encoded while it is
+    sent, so the array is never held in memory as a whole.
+
+    Args:
+        payload: The other top-level keys and values of the response.
+        stream_key: The top-level key of the streamed array.
+        items: An iterable, such as a generator, of the array's items.
+        batch_size: The number of items to encode at a time.
+    """
+    def generate() -> Iterator[bytes]:
+        yield b'{'
+        for index, key in enumerate(sorted([*payload, stream_key])):
+            yield (b',' if index else b'') + dumps(key) + b':'
+            if key == stream_key:
+                yield from _encode_array(items, batch_size)
+            else:
+                with instrumentation.serializing():
+                    value = encode(payload[key])
+                yield value
+        yield b'}'
+
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype='application/json'
+    )
+
+
+def _batch_lines(
+    items: Iterable[Dict[str, Any]],
+    batch_size: int
+) -> Iterator[bytes]:
+    """Encodes an iterable as JSON lines, one batch of items at a time."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield _encode_lines(batch)
+            batch = []
+    if batch:
+        yield _encode_lines(batch)
+
+
+def _encode_lines(batch: List[Dict[str, Any]]) -> bytes:
+    """Encodes a batch of items as JSON lines."""
+    with instrumentation.serializing():
+        return b''.join(dumps(item) + b'\n' for item in batch)
+
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compresses a stream of chunks into a gzip stream."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        with instrumentation.serializing():
+            compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    with instrumentation.serializing():
+        compressed = compressor.flush()
+    yield compressed
+
+
+def stream_ndjson_response(
+    items: Iterable[Dict[str, Any]],
+    compress: bool = False,
+    batch_size: int = 1000
+) -> Response:
+    """Builds a newline-delimited JSON response, with one line per item,
+    which is encoded while it is sent.
+
+    Args:
+        items: An iterable, such as a generator, of the items to send.
+        compress: Whether to gzip the response body.
+        batch_size: The number of items to encode at a time.
+    """
+    chunks = _batch_lines(items, batch_size)
+    response = current_app.response_class(
+        stream_with_context(_gzip(chunks) if compress else chunks),
+        mimetype='application/x-ndjson'
+    )
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
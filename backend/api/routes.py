@@ -0,0 +1,22 @@
+"""Builds the blueprint holding every route of the trivia API."""
+
+from flask import Blueprint
+
+from api import commands
+from api.errors import handlers
+from api.resources import categories, metrics, questions, quizzes
+
+
+def create_blueprint() -> Blueprint:
+    """Builds a blueprint of every route, error handler and command of the
+    API.
+
+    The modules defining them only add them to the blueprint passed to their
+    register() function, so importing them has no effect on any
+    application, and each application registers a blueprint of its own.
+    """
+    blueprint = Blueprint('api', __name__, cli_group=None)
+    for module in (categories, questions, quizzes, metrics, handlers,
+                   commands):
+        module.register(blueprint)
+    return blueprint
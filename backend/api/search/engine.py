@@ -0,0 +1,48 @@
+"""Selects the search backend for trivia questions."""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from api.models.model import db
+from api.models.question import Question
+from api.search.inverted_index import question_search_index
+
+
+def search_questions(
+    search_term: str,
+    category: Optional[str] = None,
+    page: int = 1,
+    per_page: int = 10,
+    prefix: bool = False
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Fetches one page of ranked questions matching a search term.
+
+    The SEARCH_BACKEND setting selects where searches run. With 'memory',
+    every search is served from the in-process inverted index. With
+    'database', PostgreSQL databases are searched through their trigram
+    index, while other databases, such as the SQLite databases used in
+    tests, fall back to the inverted index.
+
+    Args:
+        search_term: A term to search for (case-insensitive)
+        category: The id of a category to restrict the search to.
+        page: The page number to fetch.
+        per_page: The maximum number of results to show per page.
+        prefix: Only match the term at the start of a word.
+
+    Returns:
+        One page of matching questions, and the total number of matching
+        questions.
+    """
+    if (current_app.config.get('SEARCH_BACKEND') != 'memory' and
+            db.engine.dialect.name == 'postgresql'):
+        return Question.search(search_term, category, page, per_page, prefix)
+
+    return question_search_index.search(
+        search_term,
+        category,
+        page,
+        per_page,
+        prefix
+    )
@@ -0,0 +1,232 @@
+"""In-process trigram index for searching trivia questions."""
+
+import heapq
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import (Any, DefaultDict, Dict, Iterable, List, Optional, Set,
+                    Tuple)
+
+from api.cache.cache import Cache
+from api.models.model import db
+from api.models.question import Question
+
+
+# Typecode of the arrays holding posting lists: unsigned ints, 4 bytes on
+# every supported platform, which hold any id of an integer column
+POSTING_TYPE = 'I'
+
+# Question columns held in memory, in the order returned by Model.json()
+COLUMNS = ('id', 'question', 'answer', 'category', 'difficulty')
+
+
+def trigrams(text: str) -> Set[str]:
+    """Splits a lowercase string into its set of three-character substrings."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def intersect(postings: List[array]) -> Iterable[int]:
+    """Yields the ids present in every one of several sorted posting lists.
+
+    Args:
+        postings: Sorted posting lists, shortest first.
+    """
+    shortest, others = postings[0], postings[1:]
+    for question_id in shortest:
+        for posting in others:
+            position = bisect_left(posting, question_id)
+            if position == len(posting) or posting[position] != question_id:
+                break
+        else:
+            yield question_id
+
+
+class InvertedIndex(Cache):
+    """Holds every question in memory, along with a map from each trigram
+    of the question texts to a sorted array of the ids of the questions
+    containing it. Answers are returned with the questions, but, as with the
+    database backend, are not searched, so they are not indexed.
+
+    A search intersects the posting lists of the search term's trigrams, then
+    confirms each candidate with a substring test, so it matches exactly the
+    questions an ILIKE '%term%' query would. Terms shorter than a trigram are
+    served from the union of the posting lists of every trigram containing
+    them. Results are built from memory without querying the database.
+    """
+
+    ttl_config = 'SEARCH_INDEX_TTL'
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._rows: Dict[int, Tuple[Any, ...]] = {}
+        self._texts: Dict[int, str] = {}
+        self._ranks: Dict[int, int] = {}
+        self._postings: Dict[str, array] = {}
+        self._short: Set[int] = set()
+
+    def _store(self, row: Tuple[Any, ...]) -> Set[str]:
+        """Stores one row of COLUMNS, returning the trigrams to index."""
+        question_id, question = row[:2]
+        question = (question or '').lower()
+        question_trigrams = trigrams(question)
+
+        self._rows[question_id] = row
+        self._texts[question_id] = question
+        # Texts containing fewer trigrams are more similar to any term they
+        # contain, as measured by pg_trgm's similarity()
+        self._ranks[question_id] = len(question_trigrams)
+        if len(question) < 3:
+            self._short.add(question_id)
+        return question_trigrams
+
+    def load(self) -> None:
+        """Indexes every question in the database.
+
+        Posting lists are collected in plain lists, in id order, and packed
+        into arrays once every question has been read.
+        """
+        columns = [getattr(Question, column) for column in COLUMNS]
+        rows = db.session.query(*columns).order_by(Question.id).all()
+        self._rows = {}
+        self._texts = {}
+        self._ranks = {}
+        self._short = set()
+        postings: DefaultDict[str, List[int]] = defaultdict(list)
+        for row in rows:
+            question_id = row[0]
+            for trigram in self._store(tuple(row)):
+                postings[trigram].append(question_id)
+        self._postings = {trigram: array(POSTING_TYPE, posting)
+                          for trigram, posting in postings.items()}
+
+    def add(self, question: Question) -> None:
+        """Indexes a newly inserted question."""
+        with self._lock:
+            if not self.is_loaded or question.id in self._rows:
+                return
+            row = tuple(getattr(question, column) for column in COLUMNS)
+            for trigram in self._store(row):
+                posting = self._postings.get(trigram)
+                if posting is None:
+                    self._postings[trigram] = array(POSTING_TYPE, row[:1])
+                elif posting[-1] < question.id:
+                    posting.append(question.id)
+                else:
+                    insort(posting, question.id)
+
+    def discard(self, question_id: int) -> None:
+        """Removes a question from the index, if present."""
+        with self._lock:
+            text = self._texts.pop(question_id, None)
+            if text is None:
+                return
+            del self._rows[question_id]
+            del self._ranks[question_id]
+            self._short.discard(question_id)
+            for trigram in trigrams(text):
+                posting = self._postings.get(trigram)
+                if posting is None:
+                    continue
+                position = bisect_left(posting, question_id)
+                if (position < len(posting) and
+                        posting[position] == question_id):
+                    del posting[position]
+                if not posting:
+                    del self._postings[trigram]
+
+    def remove(self, question: Question) -> None:
+        """Removes a deleted question from the index."""
+        self.discard(question.id)
+
+    def remove_many(self, questions: List[Dict[str, Any]]) -> None:
+        """Removes a batch of deleted questions from the index."""
+        with self._lock:
+            for question in questions:
+                self.discard(question['id'])
+
+    def _candidates(self, term: str) -> Iterable[int]:
+        """Finds the ids of the questions which may contain a term."""
+        if not term:
+            return self._rows.keys()
+
+        term_trigrams = trigrams(term)
+        if term_trigrams:
+            postings = [self._postings.get(trigram)
+                        for trigram in term_trigrams]
+            if not all(postings):
+                return ()
+            return intersect(sorted(postings, key=len))
+
+        candidates = set(self._short)
+        for trigram, posting in self._postings.items():
+            if term in trigram:
+                candidates.update(posting)
+        return candidates
+
+    def search(
+        self,
+        search_term: str,
+        category: Optional[str] = None,
+        page: int = 1,
+        per_page: int = 10,
+        prefix: bool = False
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Finds the questions containing a search term.
+
+        Results are ranked by trigram similarity to the search term, as on
+        PostgreSQL, then by id.
+
+        Args:
+            search_term: A term to search for (case-insensitive)
+            category: The id of a category to restrict the search to.
+            page: The page number to fetch.
+            per_page: The maximum number of results to show per page.
+            prefix: Only match the term at the start of a word.
+
+        Returns:
+            One page of matching questions, and the total number of matching
+            questions.
+        """
+        term = search_term.lower()
+        word = ' ' + term
+        if category is not None:
+            category = str(category)
+
+        def matches(text: str) -> bool:
+            if prefix:
+                return text.startswith(term) or word in text
+            return term in text
+
+        with self._lock:
+            self._refresh_if_stale()
+            found = []
+            for question_id in self._candidates(term):
+                if not matches(self._texts[question_id]):
+                    continue
+                if (category is not None and
+                        str(self._rows[question_id][3]) != category):
+                    continue
+                found.append(question_id)
+
+            top = heapq.nsmallest(
+                page * per_page,
+                found,
+                key=lambda question_id: (self._ranks[question_id],
+                                         question_id)
+            )
+            rows = [self._rows[question_id]
+                    for question_id in top[(page - 1) * per_page:]]
+
+        return [dict(zip(COLUMNS, row)) for row in rows], len(found)
+
+
+question_search_index = InvertedIndex()
+
+Question.listen('insert', question_search_index.add)
+Question.listen(
+    'insert_many',
+    lambda questions: question_search_index.invalidate()
+)
+Question.listen('update', lambda question: question_search_index.invalidate())
+Question.listen('delete', question_search_index.remove)
+Question.listen('delete_many', question_search_index.remove_many)
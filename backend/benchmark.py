@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Benchmarks the latency and throughput of the trivia API endpoints.
+
+For each bank size, every question of the benchmark database is replaced by
+that many synthetic questions, and each endpoint is sent the same random
+requests through the Flask test client, which measures the application
+alone, and over HTTP from concurrent clients, which adds the server and the
+network. The latency percentiles, throughput and SQL statements per request
+of each run are written as JSON, so results can be compared between
+commits.
+
+With --startup, cold starts of the application are also timed, each in a
+fresh interpreter, from its import to its first response. Setting
+DB_CREATE_ALL=false times the startup of production workers, which do not
+create tables.
+
+The database is BENCHMARK_DATABASE_URL (see config.BenchmarkConfig), whose
+questions are deleted. Caches are configured as usual, so setting, for
+example, RESPONSE_CACHE_BACKEND=none measures the application without its
+response cache.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+
+from api.app import create_application
+from api.benchmarks import (SCENARIOS, Workload, measure_startup,
+                            run_client, run_http, seed_questions, serve)
+
+
+def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Seeds each bank size in turn and runs every scenario against it."""
+    startup = None
+    if args.startup:
+        print('Timing cold starts...', file=sys.stderr)
+        startup = measure_startup(args.config, args.startup)
+
+    app = create_application(args.config)
+    server = None
+    base_url = args.url
+    if 'http' in args.modes and base_url is None:
+        server, base_url = serve(app)
+
+    results: List[Dict[str, Any]] = []
+    try:
+        with app.app_context():
+            for rows in args.rows:
+                seconds = None
+                if not args.no_seed:
+                    print(f'Seeding {rows} questions...', file=sys.stderr)
+                    seconds = seed_questions(rows, args.batch_size,
+                                             args.seed)
+
+                workload = Workload(app.config['PAGE_LENGTH'], args.seed)
+                rows = sum(workload.counts.values())
+                scenarios: Dict[str, Dict[str, Any]] = {}
+                for scenario in args.scenarios:
+                    print(f'Benchmarking {scenario} on {rows} questions...',
+                          file=sys.stderr)
+                    run_client(app, workload.requests(scenario, args.warmup))
+                    # Each mode is sent requests of its own, so neither is
+                    # served from the responses cached by the other
+                    scenarios[scenario] = {}
+                    if 'client' in args.modes:
+                        scenarios[scenario]['client'] = run_client(
+                            app, workload.requests(scenario, args.requests)
+                        )
+                    if 'http' in args.modes:
+                        scenarios[scenario]['http'] = run_http(
+                            base_url,
+                            workload.requests(scenario, args.requests),
+                            args.concurrency
+                        )
+                results.append({
+                    'rows': rows,
+                    'seed_seconds': seconds,
+                    'scenarios': scenarios,
+                })
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    return {
+        'config': {
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split('@')[-1],
+            'response_cache': app.config['RESPONSE_CACHE_BACKEND'],
+            'search_backend': app.config['SEARCH_BACKEND'],
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+        },
+        'startup': startup,
+        'results': results,
+    }
+
+
+def main() -> None:
+    """Parses the command line and prints the benchmark results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--config', default='Benchmark',
+                        help='configuration class prefix')
+    parser.add_argument('--rows', type=int, nargs='*',
+                        default=[1000, 100000, 1000000],
+                        help='sizes of the question banks to seed, or none '
+                             'to only time cold starts')
+    parser.add_argument('--no-seed', action='store_true',
+                        help='benchmark the questions already stored once')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS,
+                        default=list(SCENARIOS),
+                        help='endpoints to benchmark')
+    parser.add_argument('--modes', nargs='+', choices=('client', 'http'),
+                        default=['client', 'http'],
+                        help='drive the test client, HTTP clients or both')
+    parser.add_argument('--requests', type=int, default=500,
+                        help='requests per scenario and mode')
+    parser.add_argument('--warmup', type=int, default=50,
+                        help='untimed requests per scenario, to fill caches')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='concurrent HTTP clients')
+    parser.add_argument('--url',
+                        help='benchmark an already running server over '
+                             'HTTP, sharing the benchmark database')
+    parser.add_argument('--batch-size', type=int, default=10000,
+                        help='questions to insert per transaction')
+    parser.add_argument('--startup', type=int, default=0, metavar='RUNS',
+                        help='cold starts to time, from import to the first '
+                             'response')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the synthetic data and requests')
+    parser.add_argument('--output', type=argparse.FileType('w'),
+                        default=sys.stdout,
+                        help='file to write the JSON results to')
+    args = parser.parse_args()
+    if args.no_seed:
+        args.rows = args.rows[:1] or [0]
+
+    json.dump(benchmark(args), args.output, indent=2)
+    args.output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,91 @@
 """Flask config class."""
 
 import os
+from typing import List
+
+from dotenv import find_dotenv, load_dotenv
+
+
+load_dotenv(find_dotenv())
+
+
+def env_int(name: str, default: int) -> int:
+    """Reads an integer setting from the environment."""
+    return int(os.environ.get(name, default))
+
+
+def env_list(name: str, default: List[str]) -> List[str]:
+    """Reads a comma-separated list setting from the environment."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """Reads a boolean setting ('1', 'true', 'yes' or 'on') from the
+    environment."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
 
 
 class Config(object):
-    """Sets Flask configuration variables."""
+    """Sets Flask configuration variables.
+
+    The DB_* variables tune the database engine (see api.models.engine), and
+    each may be overridden by an environment variable of the same name.
+    Read-only queries are spread across the databases of DB_REPLICA_URLS, a
+    comma-separated list, while clients which wrote within the last
+    DB_REPLICA_LAG seconds read from the primary (see api.models.routing).
+    """
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = env_int('DB_POOL_SIZE', 5)
+    DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 10)
+    DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 30)
+    DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 1800)
+    DB_POOL_PRE_PING = env_bool('DB_POOL_PRE_PING', True)
+    DB_STATEMENT_TIMEOUT = env_int('DB_STATEMENT_TIMEOUT', 0)
+    DB_PGBOUNCER = env_bool('DB_PGBOUNCER', False)
+    DB_REPLICA_URLS = env_list('DB_REPLICA_URLS', [])
+    DB_REPLICA_LAG = env_int('DB_REPLICA_LAG', 5)
+    DB_CREATE_ALL = env_bool('DB_CREATE_ALL', True)
     PAGE_LENGTH = 10
+    IMPORT_BATCH_SIZE = 1000
+    MAX_PAGE_LENGTH = 100
+    MAX_BATCH_IDS = 1000
+    CATEGORY_CACHE_TTL = 300
+    QUESTION_COUNT_TTL = 60
+    QUIZ_INDEX_TTL = 300
+    QUIZ_BATCH_LIMIT = 50
+    QUIZ_RAMP_STEP = 3
+    QUIZ_DIFFICULTY_FALLOFF = 0.25
+    QUIZ_SESSION_STORE = os.environ.get('QUIZ_SESSION_STORE', 'memory')
+    QUIZ_SESSION_TTL = env_int('QUIZ_SESSION_TTL', 3600)
+    QUIZ_SESSION_LIMIT = env_int('QUIZ_SESSION_LIMIT', 10000)
+    QUIZ_SESSION_MAX_IDS = env_int('QUIZ_SESSION_MAX_IDS', 1000000)
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'database')
+    SEARCH_INDEX_TTL = 300
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_TTL = env_int('RESPONSE_CACHE_TTL', 60)
+    RESPONSE_CACHE_SIZE = env_int('RESPONSE_CACHE_SIZE', 1024)
+    RESPONSE_CACHE_MAX_BYTES = env_int('RESPONSE_CACHE_MAX_BYTES', 1 << 20)
+    HTTP_CACHE_MAX_AGE = env_int('HTTP_CACHE_MAX_AGE', 0)
+    SERVER_TIMING = env_bool('SERVER_TIMING', True)
+    SLOW_QUERY_MS = env_int('SLOW_QUERY_MS', 100)
+    N_PLUS_ONE_THRESHOLD = env_int('N_PLUS_ONE_THRESHOLD', 10)
 
 
 class ProductionConfig(Config):
     """Sets Flask configuration variables for the production environment."""
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    DB_POOL_SIZE = env_int('DB_POOL_SIZE', 10)
+    DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 20)
+    DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 10)
+    DB_STATEMENT_TIMEOUT = env_int('DB_STATEMENT_TIMEOUT', 5000)
+    # Tables are created by 'flask init-db' when deploying, not by each worker
+    DB_CREATE_ALL = env_bool('DB_CREATE_ALL', False)
 
 
 class DevelopmentConfig(Config):
@@ -20,11 +95,36 @@ class DevelopmentConfig(Config):
     FLASK_ENV = 'development'
     #HOST = '0.0.0.0'
     SERVER_NAME = 'pythondev.local:5000'
-    SQLALCHEMY_DATABASE_URI = 'postgresql://jsmith@localhost:5432/trivia'
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        'DATABASE_URL',
+        'postgresql://jsmith@localhost:5432/trivia'
+    )
 
 
 class TestingConfig(Config):
     """Sets Flask configuration variables for the testing environment."""
     TESTING = True
     SERVER_NAME = 'pythondev.local:5000'
-    SQLALCHEMY_DATABASE_URI = 'postgresql://jsmith@localhost:5432/trivia_test'
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        'TEST_DATABASE_URL',
+        'postgresql://jsmith@localhost:5432/trivia_test'
+    )
+    # Read through a second engine on the test database, standing in for a
+    # replica, so the tests exercise read routing
+    DB_REPLICA_URLS = env_list(
+        'TEST_DATABASE_REPLICA_URLS',
+        [SQLALCHEMY_DATABASE_URI]
+    )
+    DB_POOL_SIZE = env_int('DB_POOL_SIZE', 2)
+
+
+class BenchmarkConfig(Config):
+    """Sets Flask configuration variables for benchmark.py, whose seeding
+    replaces every question of its database."""
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        'BENCHMARK_DATABASE_URL',
+        'postgresql://jsmith@localhost:5432/trivia_benchmark'
+    )
+    DB_REPLICA_URLS = env_list('BENCHMARK_DATABASE_REPLICA_URLS', [])
+    # Warn of slow queries only once they are slow at any bank size
+    SLOW_QUERY_MS = env_int('SLOW_QUERY_MS', 1000)
@@ -0,0 +1,78 @@
+"""Gunicorn configuration of the trivia API in production.
+
+    $ gunicorn --config gunicorn.conf.py
+
+The application (wsgi:app) is preloaded by the master process, which warms
+its caches and closes its database connections before forking the workers,
+so workers start warm and each opens connections of its own. Every setting
+may be overridden by an environment variable.
+
+Reloading: 'kill -HUP <master pid>' rereads this file and gracefully
+replaces every worker, letting each finish its requests within
+GRACEFUL_TIMEOUT seconds. Workers are forked from the preloaded master, so
+to deploy new code, start a new master with 'kill -USR2 <master pid>', then
+stop the old one with 'kill -QUIT <old master pid>' once the new one is
+ready.
+"""
+
+import os
+from typing import Any
+
+
+def _env_int(name: str, default: int) -> int:
+    """Reads an integer setting from the environment."""
+    return int(os.environ.get(name, default))
+
+
+def cpu_count() -> int:
+    """Counts the CPUs this process may run on, which in a container may be
+    fewer than the host has."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# Each worker holds the caches and a connection pool of its own, and its
+# threads overlap the time requests spend waiting on the database, so one
+# worker per CPU, plus one to cover a worker busy in Python, with a few
+# threads each, keeps every CPU busy without multiplying database
+# connections. Keep THREADS at or below DB_POOL_SIZE so threads never wait
+# for a pooled connection.
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('BIND', f'0.0.0.0:{os.environ.get("PORT", "8000")}')
+workers = _env_int('WEB_CONCURRENCY', cpu_count() + 1)
+threads = _env_int('THREADS', 4)
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = True
+
+timeout = _env_int('TIMEOUT', 30)
+graceful_timeout = _env_int('GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('KEEPALIVE', 5)
+
+# Replace workers after a number of requests, staggered so they are not all
+# replaced at once, to bound the growth of their memory
+max_requests = _env_int('MAX_REQUESTS', 10000)
+max_requests_jitter = _env_int('MAX_REQUESTS_JITTER', 1000)
+
+accesslog = os.environ.get('ACCESS_LOG', '-')
+errorlog = os.environ.get('ERROR_LOG', '-')
+
+
+def on_starting(server: Any) -> None:
+    """Warns of settings which keep state in the memory of each worker, and
+    so misbehave with several workers."""
+    from wsgi import app
+    from api.app import per_process_warnings
+
+    for warning in per_process_warnings(app, server.cfg.workers):
+        server.log.warning(warning)
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    """Closes any database connection inherited from the master, so the
+    worker only uses connections it opened itself."""
+    from wsgi import app
+    from api.models.model import db
+
+    db.dispose_engines(app)
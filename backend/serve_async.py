@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Serves the trivia API cooperatively, with many concurrent requests per
+process.
+
+Each request runs in a greenlet rather than a thread. The standard library
+and psycopg2 are patched so that socket reads, sleeps, locks and database
+queries yield to other greenlets instead of blocking the process, so a single
+worker can hold thousands of concurrent quiz sessions open while the request
+handlers stay synchronous. Tests and the development server keep using the
+plain synchronous mode of run.py.
+"""
+
+from gevent import monkey
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg  # noqa: E402
+patch_psycopg()
+
+import argparse  # noqa: E402
+import logging  # noqa: E402
+
+from gevent.pool import Pool  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+
+from api.app import create_application  # noqa: E402
+
+
+def main() -> None:
+    """Parses the command line and serves the application until stopped."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--config', default='Development',
+                        help='configuration class prefix')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address to listen on')
+    parser.add_argument('--port', type=int, default=5000,
+                        help='port to listen on')
+    parser.add_argument('--connections', type=int, default=10000,
+                        help='maximum number of concurrent requests')
+    args = parser.parse_args()
+
+    app = create_application(args.config)
+    server = WSGIServer(
+        (args.host, args.port),
+        app,
+        spawn=Pool(args.connections)
+    )
+    app.logger.setLevel(logging.INFO)
+    app.logger.info('Serving cooperatively on http://%s:%d',
+                    args.host, args.port)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
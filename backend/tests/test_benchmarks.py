@@ -0,0 +1,56 @@
+import unittest
+
+from api.benchmarks import (SCENARIOS, Workload, measure_startup, percentile,
+                            run_client, summarize)
+from tests.client import app
+
+
+class BenchmarksTestCase(unittest.TestCase):
+    """Tests for the benchmark harness."""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.client = app.test_client()
+
+    def tearDown(self):
+        """Executed after reach test"""
+
+    def test_percentiles(self):
+        """Test the nearest-rank percentiles of latencies."""
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(percentile(values, 0.50), 50.0)
+        self.assertEqual(percentile(values, 0.99), 99.0)
+        self.assertEqual(percentile([7.0], 0.95), 7.0)
+        self.assertIsNone(percentile([], 0.50))
+
+    def test_summarizing_a_run(self):
+        """Test reducing a run to percentiles, throughput and queries."""
+        summary = summarize([0.002, 0.001, 0.003], [1, 3, 2], 1, 2.0)
+        self.assertEqual(summary['requests'], 4)
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(summary['p50_ms'], 2.0)
+        self.assertEqual(summary['throughput_rps'], 2.0)
+        self.assertEqual(summary['queries_per_request'], 2.0)
+        self.assertEqual(summary['queries_max'], 3)
+
+    def test_running_every_scenario(self):
+        """Test sending each scenario's requests through the test client."""
+        with app.app_context():
+            workload = Workload(app.config['PAGE_LENGTH'])
+        for scenario in SCENARIOS:
+            summary = run_client(app, workload.requests(scenario, 5))
+            self.assertEqual(summary['requests'], 5, scenario)
+            self.assertEqual(summary['errors'], 0, scenario)
+            self.assertIsNotNone(summary['p99_ms'], scenario)
+            self.assertIsNotNone(summary['queries_per_request'], scenario)
+
+    def test_measuring_startup(self):
+        """Test timing a cold start of the application."""
+        database = app.config['SQLALCHEMY_DATABASE_URI']
+        summary = measure_startup('Testing', runs=1, env={
+            'TEST_DATABASE_URL': database,
+            'TEST_DATABASE_REPLICA_URLS': database,
+        })
+        self.assertEqual(summary['runs'], 1)
+        for phase in ('process', 'import', 'create', 'first_request'):
+            self.assertGreater(summary[phase]['p50_ms'], 0, phase)
@@ -0,0 +1,171 @@
+import unittest
+
+from sqlalchemy import event
+
+from api.cache.responses import (CachedResponse, KeyValueBackend, LocalClient,
+                                 response_cache)
+from api.models.model import db
+from api.models.question import Question
+from api.models.revision import Revision
+from api.models.routing import PRIMARY_HEADER
+from tests.client import app
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    """Tests for the cache of rendered responses."""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.client = app.test_client()
+        # The test replica is the test database itself, which never lags, so
+        # responses are stored right after the writes of earlier tests
+        lag = app.config['DB_REPLICA_LAG']
+        app.config['DB_REPLICA_LAG'] = 0
+        self.addCleanup(app.config.__setitem__, 'DB_REPLICA_LAG', lag)
+
+    def tearDown(self):
+        """Executed after reach test"""
+
+    def test_serving_a_page_from_the_cache_until_a_write(self):
+        """Test that pages are cached until questions are written."""
+        first = self.client.get('/questions?page=2')
+        hits = response_cache.hits
+        second = self.client.get('/questions?page=2')
+        self.assertEqual(response_cache.hits, hits + 1)
+        self.assertEqual(second.get_data(), first.get_data())
+
+        response = self.client.post('/questions', json={
+            'question': 'Is this page still cached?',
+            'answer': 'No.',
+            'category': 5,
+            'difficulty': 1,
+        })
+        total = response.get_json()['totalQuestions']
+
+        third = self.client.get('/questions?page=2')
+        self.assertEqual(response_cache.hits, hits + 1)
+        self.assertEqual(third.get_json()['totalQuestions'], total)
+
+    def test_serving_a_streamed_response_from_the_cache(self):
+        """Test that streamed responses are cached once sent."""
+        first = self.client.get('/categories/1/questions').get_json()
+        hits = response_cache.hits
+        second = self.client.get('/categories/1/questions').get_json()
+        self.assertEqual(response_cache.hits, hits + 1)
+        self.assertEqual(second, first)
+
+    def test_bypassing_the_cache_when_reading_from_the_primary(self):
+        """Test that requests pinned to the primary are not served from the
+        cache, nor stored in it."""
+        self.client.get('/questions?page=1')
+        hits, stores = response_cache.hits, response_cache.stores
+        response = self.client.get('/questions?page=1',
+                                   headers={PRIMARY_HEADER: '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_cache.hits, hits)
+
+        self.client.post('/questions', json={
+            'question': 'Is this page cached for the writer?',
+            'answer': 'No.',
+            'category': 5,
+            'difficulty': 1,
+        })
+        response = self.client.get('/questions?page=1',
+                                   headers={PRIMARY_HEADER: '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_cache.stores, stores)
+
+    def test_not_storing_responses_built_right_after_a_write(self):
+        """Test that responses which a lagging replica may have built
+        without the latest write are not cached."""
+        app.config['DB_REPLICA_LAG'] = 60
+        self.client.post('/questions', json={
+            'question': 'Has the replica received this yet?',
+            'answer': 'Maybe not.',
+            'category': 5,
+            'difficulty': 1,
+        })
+        stores = response_cache.stores
+        response = self.client.get('/questions?page=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_cache.stores, stores)
+
+    def test_storing_responses_in_a_shared_backend(self):
+        """Test storing responses and generations through a memcached-style
+        client."""
+        backend = KeyValueBackend(LocalClient())
+        response = CachedResponse(
+            200,
+            [('Content-Type', 'application/json')],
+            b'{"success":true}'
+        )
+        backend.set('key', response, 60)
+        self.assertEqual(backend.get('key'), response)
+
+        generation = backend.generation('questions')
+        modified = backend.modified('questions')
+        backend.bump('questions')
+        backend.bump('questions')
+        self.assertEqual(backend.generation('questions'), generation + 2)
+        self.assertGreaterEqual(backend.modified('questions'), modified)
+
+    def test_answering_a_conditional_request_with_one_query(self):
+        """Test that a current ETag is answered with 304 after reading the
+        revisions alone."""
+        response = self.client.get('/questions?page=1')
+        etag = response.headers['ETag']
+        self.assertIn('Last-Modified', response.headers)
+        self.assertIn('must-revalidate', response.headers['Cache-Control'])
+
+        statements = []
+        def record(conn, cursor, statement, parameters, context, many):
+            statements.append(statement)
+        engines = [db.get_engine(app), db.get_engine(app, bind='replica_0')]
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.get('/questions?page=1',
+                                       headers={'If-None-Match': etag})
+        finally:
+            for engine in engines:
+                event.remove(engine, 'before_cursor_execute', record)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(statements), 1)
+        self.assertIn('FROM revisions', statements[0])
+
+    def test_answering_a_conditional_request_after_another_process_wrote(self):
+        """Test that a write committed by another process changes the ETag,
+        which the generations of this process would not notice."""
+        response = self.client.get('/questions/2')
+        etag = response.headers['ETag']
+        response = self.client.get('/questions/2',
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        with app.app_context():
+            session = db.create_scoped_session()
+            Revision.bump(session, Question.__tablename__)
+            session.commit()
+            session.remove()
+        response = self.client.get('/questions/2',
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_answering_a_conditional_request_after_a_write(self):
+        """Test that a write changes the ETag of the questions."""
+        response = self.client.get('/categories/5/questions')
+        etag = response.headers['ETag']
+        response.get_json()
+
+        self.client.post('/questions', json={
+            'question': 'Has this category changed?',
+            'answer': 'Yes.',
+            'category': 5,
+            'difficulty': 1,
+        })
+        response = self.client.get('/categories/5/questions',
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        response.get_json()
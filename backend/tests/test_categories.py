@@ -22,6 +22,18 @@ class CategoriesTestCase(unittest.TestCase):
         self.assertTrue(data['success'])
         self.assertEqual(len(data['categories']), 6)
 
+    def test_getting_the_list_of_categories_if_modified(self):
+        """Test that an unchanged list of categories is not sent again."""
+        response = self.client.get('/categories')
+        etag = response.headers.get('ETag')
+        self.assertIsNotNone(etag)
+
+        response = self.client.get('/categories', headers={
+            'If-None-Match': etag,
+        })
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
     def test_getting_all_questions_from_a_category(self):
         """Test getting a list of trivia questions by category."""
         response = self.client.get('/categories/2/questions')
@@ -48,3 +60,20 @@ class CategoriesTestCase(unittest.TestCase):
 
         data = response.get_json()
         self.assertFalse(data['success'])
+
+    def test_getting_a_page_of_questions_from_a_category(self):
+        """Test getting trivia questions by category using a cursor."""
+        response = self.client.get('/categories/2/questions?after=0&limit=3')
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(len(data['questions']), 3)
+        self.assertEqual(data['next_cursor'], data['questions'][-1]['id'])
+
+        response = self.client.get(
+            f'/categories/2/questions?after={data["next_cursor"]}&limit=3'
+        )
+        data = response.get_json()
+        self.assertEqual(len(data['questions']), 1)
+        self.assertIsNone(data['next_cursor'])
@@ -0,0 +1,108 @@
+import unittest
+
+from api.instrumentation import instrumentation
+from api.models.engine import pool_metrics
+from api.models.model import db
+from tests.client import app
+
+
+class MetricsTestCase(unittest.TestCase):
+    """Tests for the operational metrics API."""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.client = app.test_client()
+
+    def tearDown(self):
+        """Executed after reach test"""
+
+    def test_getting_the_connection_pool_metrics(self):
+        """Test getting the state of the database connection pool."""
+        self.client.get('/categories')
+        response = self.client.get('/metrics/pool')
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertGreater(data['pool']['checkouts'], 0)
+        self.assertGreater(data['pool']['max_checked_out'], 0)
+
+    def test_measuring_each_pool_apart(self):
+        """Test that each engine's pool is measured on its own."""
+        primary = pool_metrics(app, db.engine)
+        replica = pool_metrics(app, db.get_engine(app, bind='replica_0'))
+        self.assertIsNot(primary, replica)
+
+        checkouts = primary.checkouts
+        with db.get_engine(app, bind='replica_0').connect():
+            pass
+        self.assertEqual(primary.checkouts, checkouts)
+        self.assertGreater(replica.checkouts, 0)
+
+    def test_getting_the_response_cache_metrics(self):
+        """Test getting the hits and misses of the response cache."""
+        self.client.get('/categories')
+        self.client.get('/categories')
+        response = self.client.get('/metrics/cache')
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertGreater(data['cache']['hits'], 0)
+        self.assertGreater(data['cache']['misses'], 0)
+
+    def test_getting_the_prometheus_metrics(self):
+        """Test getting the request metrics in the Prometheus format."""
+        self.client.get('/categories')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.mimetype.startswith('text/plain'))
+
+        body = response.get_data(as_text=True)
+        self.assertIn('trivia_requests_total{endpoint="api.categories"', body)
+        self.assertIn('trivia_request_duration_seconds_bucket', body)
+        self.assertIn('trivia_db_connections_checked_out', body)
+        self.assertIn('# TYPE trivia_response_cache_hits_total counter', body)
+        self.assertIn('# TYPE trivia_response_cache_misses_total counter',
+                      body)
+
+    def test_reporting_server_timing(self):
+        """Test the query count and timings of a response."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'click', 'id': 0},
+            'previous_questions': [],
+        })
+        self.assertEqual(response.status_code, 200)
+
+        timing = response.headers['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_counting_the_queries_of_a_streamed_response(self):
+        """Test that a streamed response is measured once it is sent."""
+        stats = instrumentation.endpoints.get('api.export_questions')
+        queries = stats.queries if stats else 0
+        response = self.client.get('/questions/export')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response.headers)
+        response.get_data()
+        response.close()
+
+        stats = instrumentation.endpoints['api.export_questions']
+        self.assertGreater(stats.queries, queries)
+        self.assertGreater(stats.serialize_time, 0)
+
+    def test_logging_repeated_queries(self):
+        """Test warning of a statement run repeatedly by one request."""
+        threshold = app.config['N_PLUS_ONE_THRESHOLD']
+        app.config['N_PLUS_ONE_THRESHOLD'] = 1
+        try:
+            with self.assertLogs(app.logger, 'WARNING') as logs:
+                self.client.post('/quizzes', json={
+                    'quiz_category': {'type': 'click', 'id': 0},
+                    'previous_questions': [],
+                })
+        finally:
+            app.config['N_PLUS_ONE_THRESHOLD'] = threshold
+        self.assertTrue(any('N+1' in line for line in logs.output))
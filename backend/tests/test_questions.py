@@ -1,5 +1,13 @@
+import gzip
+import json
 import unittest
 
+from sqlalchemy import event
+
+from api.cache.question_counts import question_counts
+from api.models.model import db
+from api.models.question import Question
+from api.models.routing import PRIMARY_HEADER
 from tests.client import app
 
 
@@ -76,6 +84,51 @@ class QuestionsTestCase(unittest.TestCase):
         data = response.get_json()
         self.assertTrue(data['success'])
 
+    def test_posting_a_new_question_by_category_type(self):
+        """Test posting a new question with the type of its category."""
+        response = self.client.post('/questions', json={
+            'question': 'Some other question?',
+            'answer': 'Some other answer.',
+            'category': 'history',
+            'difficulty': 2,
+        })
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertEqual(int(data['questions'][0]['category']), 4)
+
+    def test_posting_a_new_question_with_an_unknown_field(self):
+        """Test that a new question is validated as a bulk import row."""
+        response = self.client.post('/questions', json={
+            'question': 'Some question?',
+            'answer': 'Some answer.',
+            'category': 1,
+            'difficulty': 2,
+            'rating': 5,
+        })
+        self.assertEqual(response.status_code, 400)
+
+        data = response.get_json()
+        self.assertFalse(data['success'])
+        self.assertEqual(data['errors'], [
+            {'row': 1, 'message': 'Unknown fields: rating.'},
+        ])
+
+        for body in ([], {'question': 'Q?', 'answer': 'A.', 'category': 1,
+                          'difficulty': 'hard'}):
+            response = self.client.post('/questions', json=body)
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_posting_a_new_question_of_an_unknown_category(self):
+        """Test posting a new question to a category which does not exist."""
+        response = self.client.post('/questions', json={
+            'question': 'Some question?',
+            'answer': 'Some answer.',
+            'category': 'Astrology',
+            'difficulty': 2,
+        })
+        self.assertEqual(response.status_code, 400)
+
     def test_deleting_a_specific_question(self):
         """Test deleting a question from the game."""
         response = self.client.delete('/questions/23')
@@ -94,3 +147,251 @@ class QuestionsTestCase(unittest.TestCase):
         data = response.get_json()
         self.assertTrue(data['success'])
         self.assertEqual(data['total_questions'], 3)
+
+    def test_getting_a_page_of_questions_without_counting(self):
+        """Test that a page of questions takes its total from the counter
+        rather than from a COUNT query."""
+        # Load the counter, and read past the response cache
+        headers = {PRIMARY_HEADER: '1'}
+        self.client.get('/questions?page=2', headers=headers)
+        statements = []
+        def record(conn, cursor, statement, parameters, context, many):
+            statements.append(statement.lower())
+        engine = db.get_engine(app)
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.get('/questions?page=2', headers=headers)
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()['questions']), 10)
+        self.assertTrue(statements)
+        self.assertFalse([statement for statement in statements
+                          if 'count(' in statement])
+
+    def test_counting_the_questions_of_each_category(self):
+        """Test that category totals follow inserts, moves and deletes."""
+        with app.app_context():
+            question_counts.refresh()
+            science = question_counts.category(1)
+            art = question_counts.category(2)
+            question = Question(question='Which category is this in?',
+                                answer='Science, then Art.',
+                                category=1,
+                                difficulty=1)
+            question.insert()
+            self.assertEqual(question_counts.category(1), science + 1)
+
+            question.update(category=2)
+            self.assertEqual(question_counts.category(1), science)
+            self.assertEqual(question_counts.category(2), art + 1)
+
+            total = question_counts.total()
+            Question.delete_by_id(question.id)
+            self.assertEqual(question_counts.category(2), art)
+            self.assertEqual(question_counts.total(), total - 1)
+
+            question_counts.refresh()
+            self.assertEqual(question_counts.category(1), science)
+            self.assertEqual(question_counts.category(2), art)
+
+    def test_getting_a_page_of_questions_after_a_cursor(self):
+        """Test getting a page of questions using keyset pagination."""
+        response = self.client.get('/questions?after=0&limit=5')
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(len(data['questions']), 5)
+        self.assertEqual(data['nextCursor'], data['questions'][-1]['id'])
+        self.assertNotIn('totalQuestions', data)
+
+        response = self.client.get(
+            f'/questions?after={data["nextCursor"]}&limit=5&count=true'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        next_page = response.get_json()
+        self.assertGreater(next_page['questions'][0]['id'],
+                           data['nextCursor'])
+        self.assertIn('totalQuestions', next_page)
+
+    def test_getting_a_page_of_questions_after_an_invalid_cursor(self):
+        """Test that a malformed keyset cursor is rejected."""
+        response = self.client.get('/questions?after=abc')
+        self.assertEqual(response.status_code, 400)
+
+        data = response.get_json()
+        self.assertFalse(data['success'])
+
+    def test_total_questions_tracks_new_questions(self):
+        """Test that the question total is kept up to date after a write."""
+        before = self.client.get('/questions').get_json()['totalQuestions']
+        response = self.client.post('/questions', json={
+            'question': 'Another question?',
+            'answer': 'Another answer.',
+            'category': 3,
+            'difficulty': 2,
+        })
+        data = response.get_json()
+        self.assertEqual(data['totalQuestions'], before + 1)
+
+        after = self.client.get('/questions').get_json()['totalQuestions']
+        self.assertEqual(after, before + 1)
+
+    def test_searching_questions_within_a_category(self):
+        """Test searching the questions of one category."""
+        response = self.client.post('/questions/search', json={
+            'search_term': 'who',
+            'category': 1,
+        })
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['total_questions'], 1)
+        self.assertEqual(data['questions'][0]['answer'], 'Alexander Fleming')
+
+    def test_searching_questions_by_page(self):
+        """Test getting a page of search results past the last match."""
+        response = self.client.post('/questions/search', json={
+            'search_term': 'who',
+            'page': 2,
+        })
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertEqual(data['total_questions'], 3)
+        self.assertEqual(data['questions'], [])
+
+    def test_searching_questions_without_a_search_term(self):
+        """Test that a search without a search term is rejected."""
+        response = self.client.post('/questions/search', json={})
+        self.assertEqual(response.status_code, 400)
+
+        data = response.get_json()
+        self.assertFalse(data['success'])
+
+    def test_searching_questions_by_word_prefix(self):
+        """Test searching for questions with a word starting with a term."""
+        response = self.client.post('/questions/search', json={
+            'search_term': 'ose',
+            'prefix': True,
+        })
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertEqual(data['total_questions'], 0)
+
+    def test_exporting_all_questions(self):
+        """Test exporting every question as newline-delimited JSON."""
+        total = self.client.get('/questions').get_json()['totalQuestions']
+        response = self.client.get('/questions/export')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+
+        questions = [json.loads(line) for line in response.data.splitlines()]
+        self.assertEqual(len(questions), total)
+        self.assertEqual(questions, sorted(questions, key=lambda q: q['id']))
+
+    def test_exporting_all_questions_gzipped(self):
+        """Test exporting every question with gzip compression."""
+        response = self.client.get('/questions/export', headers={
+            'Accept-Encoding': 'gzip',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+
+        lines = gzip.decompress(response.data).splitlines()
+        self.assertGreater(len(lines), 0)
+        self.assertIn('question', json.loads(lines[0]))
+
+    def test_posting_many_new_questions(self):
+        """Test posting a batch of questions, one of which is invalid."""
+        response = self.client.post('/questions/bulk', json=[
+            {'question': 'Bulk one?', 'answer': 'One.',
+             'category': 1, 'difficulty': 1},
+            {'question': 'Bulk two?', 'answer': 'Two.',
+             'category': 100, 'difficulty': 2},
+            {'question': 'Bulk three?', 'answer': 'Three.',
+             'category': '3', 'difficulty': '3'},
+        ])
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['inserted'], 2)
+        self.assertEqual(data['failed'], 1)
+        self.assertEqual(data['errors'][0]['row'], 2)
+
+    def test_posting_many_new_questions_as_ndjson(self):
+        """Test posting a stream of newline-delimited questions."""
+        lines = [
+            json.dumps({'question': 'Stream one?', 'answer': 'One.',
+                        'category': 5, 'difficulty': 1}),
+            'not json',
+            json.dumps({'question': 'Stream two?', 'answer': 'Two.',
+                        'category': 5, 'difficulty': 2}),
+        ]
+        response = self.client.post(
+            '/questions/bulk',
+            data='\n'.join(lines),
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertEqual(data['inserted'], 2)
+        self.assertEqual([error['row'] for error in data['errors']], [2])
+
+    def test_posting_many_new_questions_without_an_array(self):
+        """Test that a bulk post which is not an array is rejected."""
+        response = self.client.post('/questions/bulk', json={
+            'question': 'Some question?',
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_getting_several_questions_by_id(self):
+        """Test getting a batch of questions, one of which doesn't exist."""
+        response = self.client.get('/questions?ids=2,4,1000')
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual([q['id'] for q in data['questions']], [2, 4])
+        self.assertEqual(data['missing'], [1000])
+
+    def test_getting_several_questions_by_invalid_ids(self):
+        """Test that a malformed list of question ids is rejected."""
+        response = self.client.get('/questions?ids=2,x')
+        self.assertEqual(response.status_code, 400)
+
+    def test_deleting_several_questions(self):
+        """Test deleting a batch of questions from the game."""
+        ids = []
+        for number in range(2):
+            response = self.client.post('/questions', json={
+                'question': f'Doomed question {number}?',
+                'answer': 'Doomed answer.',
+                'category': 6,
+                'difficulty': 1,
+            })
+            ids.append(response.get_json()['questions'][0]['id'])
+
+        response = self.client.delete('/questions', json={
+            'ids': ids + [1000],
+        })
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(sorted(data['deleted']), sorted(ids))
+        self.assertEqual(data['missing'], [1000])
+
+        response = self.client.get(f'/questions/{ids[0]}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_deleting_several_non_existent_questions(self):
+        """Test deleting a batch of questions which don't exist."""
+        response = self.client.delete('/questions', json={'ids': [1000]})
+        self.assertEqual(response.status_code, 404)
@@ -1,5 +1,7 @@
 import unittest
 
+from api.quiz.sessions import (MemoryQuizSessionStore, QuizSession,
+                               quiz_sessions)
 from tests.client import app
 
 
@@ -24,3 +26,273 @@ class QuizTestCase(unittest.TestCase):
         data = response.get_json()
         self.assertTrue(data['success'])
         self.assertEqual(data['question']['id'], 19)
+
+    def test_getting_a_question_from_all_categories(self):
+        """Test getting a random trivia question from any category."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'click', 'id': 0},
+            'previous_questions': [],
+        })
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertIsNotNone(data['question'])
+
+    def test_getting_a_question_when_all_have_been_asked(self):
+        """Test that no question is returned once a category is exhausted."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'Art', 'id': '2'},
+            'previous_questions': [16, 17, 18, 19],
+        })
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertIsNone(data['question'])
+
+    def test_playing_a_server_side_quiz(self):
+        """Test drawing every question of a category through a quiz id."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'Art', 'id': '2'},
+            'previous_questions': [16, 17],
+            'session': True,
+        })
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        quiz_id = data['quiz_id']
+        asked = {data['question']['id']}
+
+        response = self.client.post('/quizzes', json={'quiz_id': quiz_id})
+        data = response.get_json()
+        self.assertEqual(data['quiz_id'], quiz_id)
+        asked.add(data['question']['id'])
+        self.assertEqual(asked, {18, 19})
+
+        response = self.client.post('/quizzes', json={'quiz_id': quiz_id})
+        self.assertIsNone(response.get_json()['question'])
+
+    def test_continuing_an_unknown_quiz(self):
+        """Test continuing a quiz which does not exist."""
+        response = self.client.post('/quizzes', json={'quiz_id': 'unknown'})
+        self.assertEqual(response.status_code, 404)
+
+        data = response.get_json()
+        self.assertFalse(data['success'])
+
+    def test_evicting_quiz_sessions(self):
+        """Test that quiz sessions expire and are limited in number."""
+        expired = MemoryQuizSessionStore(ttl=0, limit=10)
+        quiz_id = expired.create(QuizSession(asked=[1, 2]))
+        self.assertIsNone(expired.get(quiz_id))
+
+        limited = MemoryQuizSessionStore(ttl=60, limit=1)
+        first = limited.create(QuizSession(asked=[1]))
+        second = limited.create(QuizSession(asked=[2]))
+        self.assertIsNone(limited.get(first))
+        self.assertEqual(limited.get(second).asked, [2])
+
+    def test_bounding_the_memory_of_quiz_sessions(self):
+        """Test that quiz sessions hold only the ids they asked, and that
+        the store evicts sessions beyond its total of question ids."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'click', 'id': 0},
+            'previous_questions': [],
+            'session': True,
+        })
+        quiz_id = response.get_json()['quiz_id']
+        with app.app_context():
+            session = quiz_sessions().get(quiz_id)
+        self.assertEqual(session.size, 1)
+
+        store = MemoryQuizSessionStore(ttl=60, limit=10, max_ids=5)
+        first = store.create(QuizSession(asked=[1, 2, 3]))
+        second = store.create(QuizSession(asked=[4, 5]))
+        self.assertEqual(store.ids, 5)
+        session = store.get(second)
+        session.asked.append(6)
+        store.put(second, session)
+        self.assertIsNone(store.get(first))
+        self.assertEqual(store.ids, 3)
+        store.delete(second)
+        self.assertEqual(store.ids, 0)
+
+    def test_getting_several_questions_at_once(self):
+        """Test getting a batch of unseen questions in one request."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'Art', 'id': '2'},
+            'previous_questions': [16],
+            'count': 5,
+        })
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(
+            sorted(question['id'] for question in data['questions']),
+            [17, 18, 19]
+        )
+
+    def test_getting_several_questions_of_a_server_side_quiz(self):
+        """Test getting a batch of questions from a server-side quiz."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'Art', 'id': '2'},
+            'previous_questions': [],
+            'session': True,
+            'count': 3,
+        })
+        data = response.get_json()
+        self.assertEqual(len(data['questions']), 3)
+
+        response = self.client.post('/quizzes', json={
+            'quiz_id': data['quiz_id'],
+            'count': 3,
+        })
+        self.assertEqual(len(response.get_json()['questions']), 1)
+
+    def test_getting_too_many_questions_at_once(self):
+        """Test requesting an invalid number of questions."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'click', 'id': 0},
+            'previous_questions': [],
+            'count': 0,
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_getting_a_question_of_a_category_in_any_case(self):
+        """Test that quiz categories are matched case-insensitively."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'art', 'id': '1'},
+            'previous_questions': [16, 17, 18],
+        })
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertEqual(data['question']['id'], 19)
+
+    def test_getting_a_question_of_an_unknown_category(self):
+        """Test getting a question from a category which does not exist."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'Astrology', 'id': '99'},
+            'previous_questions': [],
+        })
+        self.assertEqual(response.status_code, 422)
+
+        data = response.get_json()
+        self.assertFalse(data['success'])
+
+    def test_getting_a_question_without_a_category(self):
+        """Test getting a question without choosing a category."""
+        response = self.client.post('/quizzes', json={
+            'previous_questions': [],
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_getting_questions_of_an_exact_difficulty(self):
+        """Test drawing only the questions of one difficulty."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'Science', 'id': 1},
+            'previous_questions': [],
+            'difficulty': 4,
+            'strategy': 'exact',
+            'count': 5,
+        })
+        self.assertEqual(response.status_code, 200)
+
+        questions = response.get_json()['questions']
+        self.assertEqual(len(questions), 2)
+        self.assertEqual({question['difficulty'] for question in questions},
+                         {4})
+
+        first, second = (question['id'] for question in questions)
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'Science', 'id': 1},
+            'previous_questions': [first],
+            'difficulty': 4,
+            'strategy': 'exact',
+        })
+        self.assertEqual(response.get_json()['question']['id'], second)
+
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'Science', 'id': 1},
+            'previous_questions': [first, second],
+            'difficulty': 4,
+            'strategy': 'exact',
+        })
+        self.assertIsNone(response.get_json()['question'])
+
+    def test_falling_back_to_nearby_difficulties(self):
+        """Test drawing other difficulties once the preferred one is
+        exhausted."""
+        response = self.client.post('/quizzes', json={
+            'quiz_category': {'type': 'Science', 'id': 1},
+            'previous_questions': [],
+            'difficulty': 2,
+            'count': 10,
+        })
+        self.assertEqual(response.status_code, 200)
+
+        questions = response.get_json()['questions']
+        ids = [question['id'] for question in questions]
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_ramping_the_difficulty_of_a_server_side_quiz(self):
+        """Test raising the difficulty as a quiz goes on."""
+        settings = {'QUIZ_RAMP_STEP': 1, 'QUIZ_DIFFICULTY_FALLOFF': 0.0}
+        previous = {name: app.config[name] for name in settings}
+        app.config.update(settings)
+        try:
+            response = self.client.post('/quizzes', json={
+                'quiz_category': {'type': 'click', 'id': 0},
+                'previous_questions': [],
+                'strategy': 'ramp',
+                'session': True,
+                'count': 3,
+            })
+            data = response.get_json()
+            response = self.client.post('/quizzes', json={
+                'quiz_id': data['quiz_id'],
+                'count': 3,
+            })
+        finally:
+            app.config.update(previous)
+        self.assertEqual(response.status_code, 200)
+
+        # There is a single question of difficulty 5, after which the quiz
+        # is over, since other difficulties have no weight
+        questions = data['questions'] + response.get_json()['questions']
+        self.assertEqual([question['difficulty'] for question in questions],
+                         [1, 2, 3, 4, 5])
+
+    def test_getting_a_question_with_an_invalid_difficulty(self):
+        """Test that unknown strategies and difficulties are rejected."""
+        for parameters in ({'strategy': 'hardest'},
+                           {'difficulty': 'hard'},
+                           {'difficulty': 0},
+                           {'strategy': 'exact'}):
+            response = self.client.post('/quizzes', json={
+                'quiz_category': {'type': 'click', 'id': 0},
+                'previous_questions': [],
+                **parameters,
+            })
+            self.assertEqual(response.status_code, 400, parameters)
+
+    def test_getting_a_question_with_invalid_previous_questions(self):
+        """Test that previous questions which are not a list of ids are
+        rejected."""
+        for previous_questions in (5, 'abc', {'16': 'seen'}, [16, 'abc'],
+                                   [16, None], [True]):
+            for session in (False, True):
+                response = self.client.post('/quizzes', json={
+                    'quiz_category': {'type': 'click', 'id': 0},
+                    'previous_questions': previous_questions,
+                    'session': session,
+                })
+                self.assertEqual(response.status_code, 400,
+                                 previous_questions)
+
+                data = response.get_json()
+                self.assertFalse(data['success'])
@@ -0,0 +1,83 @@
+import unittest
+
+from sqlalchemy import event
+
+from api.cache.question_counts import question_counts
+from api.cache.responses import response_cache
+from api.models.model import db
+from api.models.question import Question
+from api.models.routing import PRIMARY_COOKIE, PRIMARY_HEADER
+from tests.client import app
+
+
+class ReplicaTestCase(unittest.TestCase):
+    """Tests for routing reads to the read replica."""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.client = app.test_client()
+        # Make the requests run their queries rather than hit the cache
+        with app.app_context():
+            response_cache.bump(Question)
+        self.primary = db.get_engine(app)
+        self.replica = db.get_engine(app, bind='replica_0')
+        self.statements = {self.primary: [], self.replica: []}
+        self.listeners = []
+        for engine, statements in self.statements.items():
+            def record(conn, cursor, statement, parameters, context, many,
+                       statements=statements):
+                statements.append(statement.split()[0].upper())
+            event.listen(engine, 'before_cursor_execute', record)
+            self.listeners.append((engine, record))
+
+    def tearDown(self):
+        """Executed after reach test"""
+        for engine, record in self.listeners:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    def test_reading_from_the_replica(self):
+        """Test that read-only requests are served by the replica."""
+        response = self.client.get('/questions/2')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertIn('SELECT', self.statements[self.replica])
+        self.assertEqual(self.statements[self.primary], [])
+
+    def test_writing_to_the_primary(self):
+        """Test that writes go to the primary, which then serves the
+        writer's reads."""
+        response = self.client.post('/questions', json={
+            'question': 'Which database took this write?',
+            'answer': 'The primary.',
+            'category': 5,
+            'difficulty': 1,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('INSERT', self.statements[self.primary])
+        self.assertNotIn('INSERT', self.statements[self.replica])
+        self.assertIn(PRIMARY_COOKIE, response.headers.get('Set-Cookie', ''))
+
+        replica_reads = len(self.statements[self.replica])
+        response = self.client.get('/questions/2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.statements[self.replica]), replica_reads)
+
+    def test_reading_from_the_primary_on_request(self):
+        """Test that clients may ask to read from the primary."""
+        response = self.client.get('/questions/2',
+                                   headers={PRIMARY_HEADER: '1'})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertIn('SELECT', self.statements[self.primary])
+        self.assertEqual(self.statements[self.replica], [])
+
+    def test_reloading_an_invalidated_cache_from_the_primary(self):
+        """Test that a cache invalidated by a write is not reloaded from a
+        replica which may lag behind it."""
+        with app.app_context():
+            question_counts.invalidate()
+        response = self.client.get('/questions/2')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertIn('SELECT', self.statements[self.primary])
+        self.assertTrue(question_counts.is_loaded)
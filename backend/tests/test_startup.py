@@ -0,0 +1,59 @@
+import os
+import runpy
+import unittest
+
+from api.app import per_process_warnings, warm_caches
+from api.cache.categories import category_cache
+from api.cache.question_counts import question_counts
+from api.cache.question_index import question_index
+from api.models.engine import pool_metrics
+from api.models.model import db
+from tests.client import app
+
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StartupTestCase(unittest.TestCase):
+    """Tests for starting production workers."""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.client = app.test_client()
+
+    def tearDown(self):
+        """Executed after reach test"""
+
+    def test_warming_the_caches(self):
+        """Test loading the caches before workers are forked."""
+        caches = (category_cache, question_counts, question_index)
+        for cache in caches:
+            cache.invalidate()
+
+        warm_caches(app)
+        for cache in caches:
+            self.assertTrue(cache.is_loaded)
+        self.assertEqual(pool_metrics(app, db.engine).checked_out, 0)
+
+        response = self.client.get('/categories')
+        self.assertEqual(response.status_code, 200)
+
+    def test_sizing_gunicorn_workers(self):
+        """Test the worker settings of the gunicorn configuration."""
+        settings = runpy.run_path(os.path.join(BACKEND, 'gunicorn.conf.py'))
+        self.assertTrue(settings['preload_app'])
+        self.assertEqual(settings['wsgi_app'], 'wsgi:app')
+        self.assertEqual(settings['workers'], settings['cpu_count']() + 1)
+        self.assertEqual(settings['worker_class'], 'gthread')
+        self.assertTrue(callable(settings['post_fork']))
+        self.assertTrue(callable(settings['on_starting']))
+
+    def test_warning_of_state_kept_per_worker(self):
+        """Test warning that memory stores are not shared by workers."""
+        self.assertEqual(per_process_warnings(app, 1), [])
+
+        warnings = per_process_warnings(app, 4)
+        self.assertTrue(any('QUIZ_SESSION_STORE' in warning
+                            for warning in warnings))
+        self.assertTrue(any('RESPONSE_CACHE_BACKEND' in warning
+                            for warning in warnings))
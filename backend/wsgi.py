@@ -0,0 +1,15 @@
+"""WSGI entry point of the trivia API, for production servers.
+
+The application is created with the configuration named by FLASK_CONFIG
+(default 'Production') and its caches are warmed when this module is
+imported. Under gunicorn.conf.py, which preloads it, that happens once in
+the master process, and every worker forked from it starts warm.
+"""
+
+import os
+
+from api.app import create_application, warm_caches
+
+
+app = create_application(os.environ.get('FLASK_CONFIG', 'Production'))
+warm_caches(app)